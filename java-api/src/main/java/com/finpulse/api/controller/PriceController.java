@@ -18,11 +18,12 @@ public class PriceController {
     @GetMapping("/prices/{ticker}")
     public List<PriceRow> prices(
             @PathVariable("ticker") String ticker,                 // <-- explicit
+            @RequestParam(value = "interval", required = false) String interval, // <-- explicit
             @RequestParam(value = "start", required = false) String start, // <-- explicit
             @RequestParam(value = "end", required = false) String end,     // <-- explicit
             @RequestParam(value = "limit", required = false) Integer limit, // <-- explicit
             @RequestParam(value = "offset", required = false) Integer offset // <-- explicit
     ) {
-        return priceService.getPrices(ticker, start, end, limit, offset);
+        return priceService.getPrices(ticker, interval, start, end, limit, offset);
     }
 }
\ No newline at end of file
@@ -1,7 +1,6 @@
 package com.finpulse.api.repository;
 
 import com.finpulse.api.model.PriceRow;
-import org.springframework.jdbc.core.JdbcTemplate;
 import org.springframework.stereotype.Repository;
 
 import java.util.ArrayList;
@@ -10,14 +9,15 @@ import java.util.List;
 @Repository
 public class PriceRepository {
 
-    private final JdbcTemplate jdbcTemplate;
+    private final ShardRouter shardRouter;
 
-    public PriceRepository(JdbcTemplate jdbcTemplate) {
-        this.jdbcTemplate = jdbcTemplate;
+    public PriceRepository(ShardRouter shardRouter) {
+        this.shardRouter = shardRouter;
     }
 
     public List<PriceRow> findPrices(
             String ticker,
+            String interval,
             String start,
             String end,
             int limit,
@@ -25,11 +25,12 @@ public class PriceRepository {
     ) {
         StringBuilder sql = new StringBuilder(
                 "SELECT ticker, date, open, high, low, close, adj_close, volume " +
-                "FROM prices WHERE ticker = ?"
+                "FROM prices WHERE ticker = ? AND interval = ?"
         );
 
         List<Object> params = new ArrayList<>();
         params.add(ticker);
+        params.add(interval);
 
         if (start != null && !start.isBlank()) {
             sql.append(" AND date >= ?");
@@ -45,7 +46,7 @@ public class PriceRepository {
         params.add(limit);
         params.add(offset);
 
-        return jdbcTemplate.query(
+        return shardRouter.forTicker(ticker).query(
                 sql.toString(),
                 (rs, rowNum) -> new PriceRow(
                         rs.getString("ticker"),
@@ -62,7 +63,7 @@ public class PriceRepository {
     }
 
     public boolean tickerExists(String ticker) {
-        Integer count = jdbcTemplate.queryForObject(
+        Integer count = shardRouter.forTicker(ticker).queryForObject(
                 "SELECT COUNT(1) FROM prices WHERE ticker = ?",
                 Integer.class,
                 ticker
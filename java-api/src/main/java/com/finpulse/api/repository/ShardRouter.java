@@ -0,0 +1,84 @@
+package com.finpulse.api.repository;
+
+import org.springframework.beans.factory.annotation.Value;
+import org.springframework.jdbc.core.JdbcTemplate;
+import org.springframework.stereotype.Component;
+import org.sqlite.SQLiteDataSource;
+
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.zip.CRC32;
+
+/**
+ * Finds the SQLite file(s) the pipeline wrote a ticker to.
+ *
+ * With DB_SHARDS=1 everything lives in the main datasource. With more, the
+ * pipeline hash-partitions tickers across market.shard0.db, market.shard1.db, ...
+ * (see finpulse_py/shard.py); the file names and the hash below must match
+ * ShardPaths and ShardIndex there.
+ */
+@Component
+public class ShardRouter {
+
+    private final List<JdbcTemplate> shards;
+
+    public ShardRouter(
+            JdbcTemplate jdbcTemplate,
+            @Value("${finpulse.db.path}") String dbPath,
+            @Value("${finpulse.db.shards:1}") int shardCount
+    ) {
+        if (shardCount < 1) {
+            throw new IllegalArgumentException("finpulse.db.shards must be >= 1, got " + shardCount);
+        }
+
+        if (shardCount == 1) {
+            this.shards = List.of(jdbcTemplate);
+            return;
+        }
+
+        List<JdbcTemplate> templates = new ArrayList<>();
+        for (String path : shardPaths(dbPath, shardCount)) {
+            SQLiteDataSource dataSource = new SQLiteDataSource();
+            dataSource.setUrl("jdbc:sqlite:" + path);
+            templates.add(new JdbcTemplate(dataSource));
+        }
+        this.shards = List.copyOf(templates);
+    }
+
+    /** The shard holding every row of this ticker. */
+    public JdbcTemplate forTicker(String ticker) {
+        return shards.get(shardIndex(ticker, shards.size()));
+    }
+
+    /** Every shard, for queries that span tickers. */
+    public List<JdbcTemplate> all() {
+        return shards;
+    }
+
+    // Same as ShardPaths: market.db -> market.shard0.db, market.shard1.db, ...
+    static List<String> shardPaths(String dbPath, int shardCount) {
+        int sep = Math.max(dbPath.lastIndexOf('/'), dbPath.lastIndexOf('\\'));
+        int dot = dbPath.lastIndexOf('.');
+
+        String root = dbPath;
+        String ext = ".db";
+        if (dot > sep + 1) {
+            root = dbPath.substring(0, dot);
+            ext = dbPath.substring(dot);
+        }
+
+        List<String> paths = new ArrayList<>();
+        for (int i = 0; i < shardCount; i++) {
+            paths.add(root + ".shard" + i + ext);
+        }
+        return paths;
+    }
+
+    // Same as ShardIndex: zlib.crc32 of the UTF-8 ticker, modulo the shard count
+    static int shardIndex(String ticker, int shardCount) {
+        CRC32 crc = new CRC32();
+        crc.update(ticker.getBytes(StandardCharsets.UTF_8));
+        return (int) (crc.getValue() % shardCount);
+    }
+}
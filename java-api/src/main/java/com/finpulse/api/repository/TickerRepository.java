@@ -3,19 +3,27 @@ package com.finpulse.api.repository;
 import org.springframework.jdbc.core.JdbcTemplate;
 import org.springframework.stereotype.Repository;
 
+import java.util.ArrayList;
 import java.util.List;
+import java.util.TreeSet;
 
 @Repository
 public class TickerRepository {
 
-    private final JdbcTemplate jdbcTemplate;
+    private final ShardRouter shardRouter;
 
-    public TickerRepository(JdbcTemplate jdbcTemplate) {
-        this.jdbcTemplate = jdbcTemplate;
+    public TickerRepository(ShardRouter shardRouter) {
+        this.shardRouter = shardRouter;
     }
 
     public List<String> findAllTickers() {
         String sql = "SELECT DISTINCT ticker FROM prices ORDER BY ticker";
-        return jdbcTemplate.queryForList(sql, String.class);
+
+        // A ticker lives in exactly one shard; merge them back into one sorted list
+        TreeSet<String> tickers = new TreeSet<>();
+        for (JdbcTemplate shard : shardRouter.all()) {
+            tickers.addAll(shard.queryForList(sql, String.class));
+        }
+        return new ArrayList<>(tickers);
     }
-}
\ No newline at end of file
+}
@@ -15,9 +15,12 @@ public class PriceService {
         this.priceRepository = priceRepository;
     }
 
-    public List<PriceRow> getPrices(String ticker, String start, String end, Integer limit, Integer offset) {
+    public List<PriceRow> getPrices(String ticker, String interval, String start, String end, Integer limit, Integer offset) {
         String t = ticker.toUpperCase();
 
+        // Bars of different sizes live side by side; daily is the default view
+        String i = (interval == null || interval.isBlank()) ? "1d" : interval.trim();
+
         int safeLimit = (limit == null) ? 100 : Math.min(Math.max(limit, 1), 500);
         int safeOffset = (offset == null) ? 0 : Math.max(offset, 0);
 
@@ -26,6 +29,6 @@ public class PriceService {
             throw new IllegalArgumentException("TICKER_NOT_FOUND:" + t);
         }
 
-        return priceRepository.findPrices(t, start, end, safeLimit, safeOffset);
+        return priceRepository.findPrices(t, i, start, end, safeLimit, safeOffset);
     }
 }
\ No newline at end of file
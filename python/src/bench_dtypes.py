@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import sys  # Needed to read command-line arguments
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from finpulse_py.compact import CompactPrices, FrameMemoryBytes
+from finpulse_py.resample import ResampleBars
+from finpulse_py.transform import ComputeAnalytics, ComputeRisk
+
+
+def MakePrices(n_tickers: int, n_days: int, seed: int = 7) -> pd.DataFrame:
+    """
+    Synthetic daily bars shaped like FetchOhlcv output (float64 + string columns).
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=n_days).strftime("%Y-%m-%d")
+
+    rets = rng.normal(0.0003, 0.02, size=(n_tickers, n_days))
+    start = rng.uniform(5, 500, size=(n_tickers, 1))
+    close = np.round(start * np.exp(np.cumsum(rets, axis=1)), 2).ravel()
+
+    return pd.DataFrame(
+        {
+            "ticker": np.repeat([f"T{t:05d}" for t in range(n_tickers)], n_days),
+            "interval": "1d",
+            "date": np.tile(dates, n_tickers),
+            "open": np.round(close * 0.998, 2),
+            "high": np.round(close * 1.01, 2),
+            "low": np.round(close * 0.99, 2),
+            "close": close,
+            "adj_close": close,
+            "volume": rng.integers(1_000, 50_000_000, size=close.size).astype(np.float64),
+        }
+    )
+
+
+def RunStages(prices: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Every intermediate frame the pipeline builds from one batch of bars."""
+    return {
+        "prices": prices,
+        "analytics": ComputeAnalytics(prices, price_col="adj_close"),
+        "weekly": ResampleBars(prices, "1wk"),
+        "risk": ComputeRisk(prices, price_col="adj_close"),
+    }
+
+
+def MaxRelError(a: pd.Series, b: pd.Series) -> float:
+    """Largest |a - b| / max(|b|, 1e-12) over rows where b is present."""
+    a = a.to_numpy(dtype=np.float64)
+    b = b.to_numpy(dtype=np.float64)
+    ok = ~np.isnan(b)
+    return float(np.max(np.abs(a[ok] - b[ok]) / np.maximum(np.abs(b[ok]), 1e-12), initial=0.0))
+
+
+def Main(argv: List[str]) -> int:
+    """
+    Usage:
+      python python/src/bench_dtypes.py [n_tickers] [n_days]
+
+    Prints memory per pipeline stage for float64/object frames vs compact
+    frames, then the worst relative error of the compact results.
+    """
+    n_tickers = int(argv[1]) if len(argv) > 1 else 1000
+    n_days = int(argv[2]) if len(argv) > 2 else 500
+
+    wide = MakePrices(n_tickers, n_days)
+    print(f"Rows: {len(wide):,}  (tickers={n_tickers}, days={n_days})\n")
+
+    base = RunStages(wide)
+    small = RunStages(CompactPrices(wide))
+
+    print(f"{'stage':<10} {'float64/object':>16} {'compact':>12} {'saved':>8}")
+    for stage in base:
+        before = FrameMemoryBytes(base[stage])
+        after = FrameMemoryBytes(small[stage])
+        print(f"{stage:<10} {before / 2**20:>13.1f} MB {after / 2**20:>9.1f} MB {1 - after / before:>7.0%}")
+
+    # Accuracy: compare compact results against the float64 run, row for row
+    a = base["analytics"].sort_values(["ticker", "date"]).reset_index(drop=True)
+    b = small["analytics"].astype({"ticker": str}).sort_values(["ticker", "date"]).reset_index(drop=True)
+    r_base = base["risk"].set_index("ticker").sort_index()
+    r_small = small["risk"].astype({"ticker": str}).set_index("ticker").sort_index()
+
+    print("\nMax relative error vs float64:")
+    for col in ("ma20", "ma50", "vol20"):
+        print(f"  analytics.{col:<13} {MaxRelError(b[col], a[col]):.2e}")
+    print(f"  analytics.daily_return  {np.nanmax(np.abs(b['daily_return'] - a['daily_return'])):.2e} (absolute)")
+    for col in ("var_95_1d", "sharpe", "max_drawdown"):
+        print(f"  risk.{col:<18} {MaxRelError(r_small[col], r_base[col]):.2e}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(Main(sys.argv))
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import os
+import sys  # Needed to read command-line arguments
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from finpulse_py.db import UpsertPrices, WriteStats
+from finpulse_py.shard import OpenShards, UpsertSharded
+
+
+def MakeRows(n_tickers: int, n_days: int) -> List[Dict[str, Any]]:
+    """
+    Synthetic daily bars: n_tickers tickers x n_days distinct dates each.
+    """
+    dates = pd.bdate_range("2000-01-03", periods=n_days).strftime("%Y-%m-%d")
+    rows = []
+    for t in range(n_tickers):
+        for d, date in enumerate(dates):
+            px = 100.0 + (t + d) % 50
+            rows.append(
+                {
+                    "ticker": f"T{t:04d}",
+                    "interval": "1d",
+                    "date": date,
+                    "open": px,
+                    "high": px + 1.0,
+                    "low": px - 1.0,
+                    "close": px + 0.5,
+                    "adj_close": px + 0.5,
+                    "volume": 1000 + d,
+                }
+            )
+    return rows
+
+
+def Bench(
+    rows: List[Dict[str, Any]],
+    n_shards: int,
+    batch_size: int,
+    workers: str,
+    db_dir: str,
+) -> float:
+    """
+    Upserts rows into a fresh n_shards-way sharded DB under db_dir with the
+    given shard workers ("thread" or "process"); returns rows per second.
+    """
+    with tempfile.TemporaryDirectory(dir=db_dir) as tmpdir:
+        shards = OpenShards(os.path.join(tmpdir, "bench.db"), n_shards)
+
+        started = time.perf_counter()
+        UpsertSharded(
+            shards, UpsertPrices, rows, batch_size=batch_size, stats=WriteStats(), workers=workers
+        )
+        elapsed = time.perf_counter() - started
+
+    return len(rows) / elapsed
+
+
+def Main(argv: List[str]) -> int:
+    """
+    Usage:
+      python python/src/bench_shards.py [n_tickers] [n_days] [batch_size] [db_dir]
+
+    Prints ingest throughput for 1, 2, 4 and 8 shards on the same rows, once
+    with a thread per shard and once with a process per shard. Speedups are
+    against 1 shard.
+
+    db_dir should sit on the disk the real database uses (default: the
+    system temp dir, which may be a RAM disk where commits cost nothing).
+    Process workers only pay off with more than one CPU; thread workers
+    only overlap SQLite commits, so they gain when fsync is slow.
+    """
+    n_tickers = int(argv[1]) if len(argv) > 1 else 500
+    n_days = int(argv[2]) if len(argv) > 2 else 500
+    batch_size = int(argv[3]) if len(argv) > 3 else 500
+    db_dir = argv[4] if len(argv) > 4 else tempfile.gettempdir()
+
+    rows = MakeRows(n_tickers, n_days)
+    print(f"Rows: {len(rows)}  (tickers={n_tickers}, days={n_days}, batch_size={batch_size})")
+    print(f"CPUs: {os.cpu_count()}  DB dir: {db_dir}")
+
+    for workers in ("thread", "process"):
+        print(f"\n{workers} per shard:")
+        baseline = None
+        for n_shards in (1, 2, 4, 8):
+            rate = Bench(rows, n_shards, batch_size, workers, db_dir)
+            baseline = baseline or rate
+            print(f"  shards={n_shards}:  {rate:>12,.0f} rows/s   x{rate / baseline:.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(Main(sys.argv))
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from finpulse_py.db import (
+    FetchCorporateActionRows,
+    FetchPrices,
+    FetchUnappliedActionTickers,
+)
+
+# Columns of a corporate actions frame (provider, local file or DB)
+ACTION_COLUMNS = ["ticker", "date", "action", "value", "source"]
+
+# Where an action came from:
+#   "provider" - the price provider's own list; its adj_close already includes them
+#   "file"     - a local CSV; applied on top of whatever adj_close the provider sent
+ACTION_SOURCES = ("provider", "file")
+
+
+def AdjustmentFactors(bars: pd.DataFrame, actions: pd.DataFrame) -> pd.Series:
+    """
+    Back-adjustment factor for every bar (aligned to bars.index).
+
+    adj_close = close * factor, where factor is the product of every action
+    with an ex-date *after* the bar:
+    - split of ratio r:           1 / r
+    - dividend d (cash/share):    1 - d / close on the bar before the ex-date
+
+    Actions landing on a non-trading day apply from the next bar. Computed for
+    all tickers at once: one as-of join + one grouped reverse cumulative product.
+    """
+    factor = pd.Series(1.0, index=bars.index)
+    if bars.empty or actions is None or actions.empty:
+        return factor
+
+    df = bars[["ticker", "date", "close"]].copy()
+    df["ticker"] = df["ticker"].astype(str)  # as-of join needs matching key dtypes
+    df["ts"] = pd.to_datetime(df["date"]).astype("datetime64[ns]")
+    df = df.sort_values(["ticker", "ts"])
+    df["prev_close"] = df.groupby("ticker")["close"].shift(1)
+
+    acts = actions.copy()
+    acts["ticker"] = acts["ticker"].astype(str)
+    acts["ts"] = pd.to_datetime(acts["date"]).astype("datetime64[ns]")
+    acts["split"] = np.where(acts["action"] == "split", acts["value"], 1.0)
+    acts["dividend"] = np.where(acts["action"] == "dividend", acts["value"], 0.0)
+
+    # Attach each action to the first bar on/after its ex-date (same ticker)
+    keys = df[["ticker", "ts"]].rename(columns={"ts": "bar_ts"})
+    keys["bar"] = df.index
+    matched = pd.merge_asof(
+        acts.sort_values("ts"),
+        keys.sort_values("bar_ts"),
+        left_on="ts",
+        right_on="bar_ts",
+        by="ticker",
+        direction="forward",
+    ).dropna(subset=["bar"])
+
+    if matched.empty:
+        return factor
+
+    # Several actions on one bar combine: splits multiply, dividends add up
+    per_bar = matched.groupby("bar").agg(split=("split", "prod"), dividend=("dividend", "sum"))
+    per_bar.index = per_bar.index.astype(df.index.dtype)
+
+    event = pd.Series(1.0, index=df.index)
+    prev_close = df.loc[per_bar.index, "prev_close"]
+    div_factor = (1.0 - per_bar["dividend"] / prev_close).fillna(1.0)
+    event.loc[per_bar.index] = div_factor / per_bar["split"]
+
+    # A dividend at or above the previous close is bad data; don't let it flip signs
+    event = event.where(event > 0, 1.0)
+
+    # Product of events strictly after each bar = reverse cumprod / own event
+    rev = event.iloc[::-1].groupby(df["ticker"].iloc[::-1]).cumprod().iloc[::-1]
+    factor.loc[df.index] = rev / event
+
+    return factor
+
+
+def _BySource(actions: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Splits actions into (provider, file) ones; rows without a source count as file."""
+    source = actions["source"] if "source" in actions.columns else pd.Series("file", index=actions.index)
+    is_provider = source.eq("provider")
+    return actions[is_provider], actions[~is_provider]
+
+
+def _WithAdjClose(bars: pd.DataFrame, adjusted: pd.Series, rows: pd.Series) -> pd.DataFrame:
+    """Copy of bars with adj_close replaced on rows (keeps the column dtype, e.g. float32)."""
+    out = bars.copy()
+    if "adj_close" not in out.columns:
+        out["adj_close"] = out["close"].astype(np.float64)
+    out.loc[rows, "adj_close"] = adjusted.astype(out["adj_close"].dtype)
+    return out
+
+
+def ApplyAdjustments(bars: pd.DataFrame, actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a copy of bars with adj_close adjusted for the actions.
+
+    - provider actions: adj_close is rebuilt from close, for tickers that
+      have any (the provider's own adjustment covers the same events)
+    - file actions: applied on top, so one CSV dividend multiplies into the
+      provider's adj_close instead of replacing every dividend it held
+
+    Tickers without actions keep whatever adj_close they came with.
+    """
+    if bars.empty or actions is None or actions.empty:
+        return bars.copy()
+
+    provider, file = _BySource(actions)
+
+    touched = bars["ticker"].isin(actions["ticker"].unique())
+    sub = bars[touched]
+    base = sub["adj_close"] if "adj_close" in sub.columns else sub["close"]
+    adjusted = base.astype(np.float64).fillna(sub["close"].astype(np.float64))
+
+    if not provider.empty:
+        rebuild = sub["ticker"].isin(provider["ticker"].unique())
+        factor = AdjustmentFactors(sub[rebuild], provider)
+        adjusted[rebuild] = sub.loc[rebuild, "close"].astype(np.float64) * factor
+
+    if not file.empty:
+        adjusted = adjusted * AdjustmentFactors(sub, file)
+
+    return _WithAdjClose(bars, adjusted, touched)
+
+
+def RemoveFileAdjustments(bars: pd.DataFrame, actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Undoes the file-action part of ApplyAdjustments on stored bars, giving
+    back the provider's adj_close so new actions can be applied from scratch.
+    """
+    if bars.empty or actions is None or actions.empty:
+        return bars.copy()
+
+    _, file = _BySource(actions)
+    touched = bars["ticker"].isin(file["ticker"].unique())
+    if not touched.any():
+        return bars.copy()
+
+    sub = bars[touched]
+    factor = AdjustmentFactors(sub, file)
+    return _WithAdjClose(bars, sub["adj_close"].astype(np.float64) / factor, touched)
+
+
+def LoadCorporateActions(conn: sqlite3.Connection, tickers: Sequence[str]) -> pd.DataFrame:
+    """Stored corporate actions for the tickers as a DataFrame."""
+    rows = FetchCorporateActionRows(conn, list(tickers))
+    return pd.DataFrame(rows, columns=ACTION_COLUMNS).astype({"value": float})
+
+
+def MergeActions(stored: pd.DataFrame, changed: pd.DataFrame) -> pd.DataFrame:
+    """Stored actions with the new/changed ones laid over them (same key = changed wins)."""
+    if changed.empty:
+        return stored
+    merged = pd.concat([stored, changed[ACTION_COLUMNS]], ignore_index=True)
+    return merged.drop_duplicates(["ticker", "date", "action"], keep="last")
+
+
+def LoadStoredBars(conn: sqlite3.Connection, tickers: Sequence[str], interval: str) -> pd.DataFrame:
+    """Every stored bar of the given interval for the tickers, as one DataFrame."""
+    frames = [pd.DataFrame(FetchPrices(conn, t, interval)) for t in tickers]
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def NewOrChangedActions(incoming: pd.DataFrame, stored: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows of incoming that aren't stored yet, or whose value or source differs from the stored one.
+    """
+    if incoming.empty:
+        return incoming
+
+    merged = incoming.merge(
+        stored, on=["ticker", "date", "action"], how="left", suffixes=("", "_stored")
+    )
+    changed = (
+        merged["value_stored"].isna()
+        | ~np.isclose(merged["value"], merged["value_stored"])
+        | merged["source"].ne(merged["source_stored"])
+    )
+    return merged.loc[changed, ACTION_COLUMNS]
+
+
+def ActionsToApply(conn: sqlite3.Connection, actions: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Works out which adjusted histories have to be rebuilt. Writes nothing.
+
+    Returns (changed, tickers):
+      changed - new/changed actions, to store with RewriteAdjustedHistory
+      tickers - their tickers, plus any whose stored actions a failed run
+                never finished applying (see MarkActionsApplied)
+    """
+    pending = FetchUnappliedActionTickers(conn)
+
+    if actions is None or actions.empty:
+        return pd.DataFrame(columns=ACTION_COLUMNS), pending
+
+    if "source" not in actions.columns:
+        actions = actions.assign(source="file")
+
+    stored = LoadCorporateActions(conn, actions["ticker"].unique().tolist())
+    changed = NewOrChangedActions(actions, stored)
+    return changed, sorted(set(changed["ticker"]) | set(pending))
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from finpulse_py.resample import FormatBarDates
+
+# Price columns that can drop to float32
+PRICE_COLUMNS = ["open", "high", "low", "close", "adj_close"]
+
+# Largest error we accept from the float32 round-trip of a price: half a cent.
+# float32 keeps that up to ~131k per share; pricier tickers (e.g. BRK-A) stay float64.
+FLOAT32_ATOL = 0.005
+
+
+def _Float32IfLossless(s: pd.Series, atol: float = FLOAT32_ATOL) -> pd.Series:
+    """
+    Downcasts a price column to float32 unless that would move any value by more than atol.
+    """
+    s32 = s.astype(np.float32)
+    diff = np.abs(s32.to_numpy(dtype=np.float64) - s.to_numpy(dtype=np.float64))
+    return s32 if np.nanmax(diff, initial=0.0) <= atol else s
+
+
+def _UnsignedVolume(s: pd.Series) -> pd.Series:
+    """
+    Volume as the smallest nullable unsigned int that fits. Missing volume
+    stays missing (<NA>), so it is still stored as NULL, not 0.
+    """
+    top = s.max()
+    small = pd.isna(top) or top <= np.iinfo(np.uint32).max
+    return s.astype("UInt32" if small else "UInt64")
+
+
+def _ShortestFloat64(s: pd.Series) -> np.ndarray:
+    """
+    float32 values as the float64 of their shortest decimal (123.45, not
+    123.44999694), without building strings: round to 7 significant digits,
+    then 8, then 9 for the few values that need more to round-trip.
+    """
+    x32 = s.to_numpy(dtype=np.float32)
+    x = x32.astype(np.float64)
+    out = x.copy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mag = np.floor(np.log10(np.abs(x)))
+    mag = np.where(np.isfinite(mag), mag, 0.0)
+
+    todo = np.flatnonzero(np.isfinite(x))
+    for digits in (7, 8, 9):
+        if todo.size == 0:
+            break
+        scale = 10.0 ** (digits - 1 - mag[todo])
+        rounded = np.round(x[todo] * scale) / scale
+        exact = rounded.astype(np.float32) == x32[todo]
+        out[todo[exact]] = rounded[exact]
+        todo = todo[~exact]
+
+    return out
+
+
+def CompactPrices(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns prices in the memory-compact representation:
+      ticker, interval -> category       (one small int per row instead of a Python string)
+      date             -> datetime64[s]  (8 bytes instead of a ~60 byte string object)
+      open ... adj_close -> float32      (when the values survive the round-trip)
+      volume           -> UInt32/UInt64      (nullable, so missing volume stays NULL)
+
+    Every transform accepts this directly; ToDbRecords turns it back into
+    plain values only at the SQLite boundary.
+    """
+    if prices.empty:
+        return prices
+
+    out = pd.DataFrame(index=prices.index)
+    for col in prices.columns:
+        s = prices[col]
+        if col in ("ticker", "interval"):
+            out[col] = s.astype("category")
+        elif col == "date":
+            out[col] = pd.to_datetime(s).astype("datetime64[s]")
+        elif col in PRICE_COLUMNS:
+            out[col] = _Float32IfLossless(s.astype(np.float64))
+        elif col == "volume":
+            out[col] = _UnsignedVolume(s)
+        else:
+            out[col] = s
+
+    return out
+
+
+def IsCompact(frame: pd.DataFrame) -> bool:
+    """True if frame is in the CompactPrices representation (categorical tickers)."""
+    return "ticker" in frame.columns and isinstance(frame["ticker"].dtype, pd.CategoricalDtype)
+
+
+def ToDbRecords(frame: pd.DataFrame, interval: str) -> List[Dict[str, Any]]:
+    """
+    Rows ready for the Upsert* functions, from plain or compact frames.
+
+    - datetime dates become the ISO strings stored in SQLite
+    - float32 values go out as their shortest decimal (123.45, not 123.44999694)
+    - missing volume (<NA>) goes out as None
+    """
+    if not IsCompact(frame) and not pd.api.types.is_datetime64_any_dtype(frame.get("date")):
+        return frame.to_dict(orient="records")
+
+    cols: Dict[str, Any] = {}
+    for col in frame.columns:
+        s = frame[col]
+        if col == "date" and pd.api.types.is_datetime64_any_dtype(s):
+            cols[col] = FormatBarDates(s, interval)
+        elif s.dtype == np.float32:
+            cols[col] = _ShortestFloat64(s)
+        else:
+            cols[col] = s
+
+    return pd.DataFrame(cols, index=frame.index).to_dict(orient="records")
+
+
+def FrameMemoryBytes(frame: pd.DataFrame) -> int:
+    """Deep memory footprint of a DataFrame (includes the Python string objects)."""
+    return int(frame.memory_usage(deep=True).sum())
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os  # Read environment variables like DB_PATH, TICKERS, etc.
-from dataclasses import dataclass  # Clean way to bundle settings together
+from dataclasses import dataclass, field  # Clean way to bundle settings together
 from typing import List  # Type hints for readability
 
 from dotenv import load_dotenv  # Loads variables from a .env file into os.environ
@@ -18,6 +18,29 @@ class Settings:
     db_path: str
     tickers: List[str]
 
+    # Writer tuning: rows per transaction and how long to wait on a locked DB
+    write_batch_size: int = 5000
+    busy_timeout_ms: int = 5000
+
+    # Number of SQLite files tickers are hash-partitioned across (1 = just db_path).
+    # The Java API needs the same value (its DB_SHARDS) to find the shard files.
+    db_shards: int = 1
+
+    # How shards are written side by side: "auto", "process" or "thread"
+    shard_workers: str = "auto"
+
+    # Splits/dividends source: "" (off), "provider", or a path to a local CSV
+    corporate_actions: str = ""
+
+    # Keep frames in compact dtypes (categorical tickers, float32 prices, ...)
+    compact_dtypes: bool = False
+
+    # Bar size fetched from the provider, and coarser sizes derived locally from it
+    interval: str = "1d"
+    # How much history to download ("" = the longest the provider serves for interval)
+    period: str = ""
+    resample_intervals: List[str] = field(default_factory=lambda: ["1wk", "1mo"])
+
 
 def ParseTickers(raw: str) -> List[str]:
     """
@@ -63,9 +86,48 @@ def GetSettings() -> Settings:
     # Convert "AAPL,MSFT" -> ["AAPL","MSFT"]
     tickers = ParseTickers(tickers_raw)
 
+    # Smaller batches = shorter write locks, so API readers are never stalled for long
+    write_batch_size = int(os.getenv("WRITE_BATCH_SIZE", "5000").strip())
+
+    # How long the writer waits on a lock held by another connection before retrying
+    busy_timeout_ms = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000").strip())
+
+    # Split storage across N files once one SQLite writer becomes the bottleneck
+    # The Java API reads the shards too when started with the same DB_SHARDS
+    db_shards = int(os.getenv("DB_SHARDS", "1").strip())
+
+    # One process per shard on multi-core machines, threads otherwise
+    shard_workers = os.getenv("SHARD_WORKERS", "auto").strip().lower()
+
+    # Where splits/dividends come from ("" = don't load any)
+    corporate_actions = os.getenv("CORPORATE_ACTIONS", "").strip()
+
+    # Opt-in: much smaller DataFrames for large universes, at float32 precision
+    compact_dtypes = os.getenv("COMPACT_DTYPES", "0").strip().lower() in ("1", "true", "yes")
+
+    # Bar size to download (e.g. 1d, 1h, 5m, 1m)
+    interval = os.getenv("INTERVAL", "1d").strip()
+
+    # How far back to download (e.g. 7d, 60d, 2y); empty = longest allowed for INTERVAL
+    period = os.getenv("PERIOD", "").strip()
+
+    # Coarser bar sizes built from the fetched bars instead of downloaded again
+    resample_intervals = [
+        i.strip() for i in os.getenv("RESAMPLE_INTERVALS", "1wk,1mo").split(",") if i.strip()
+    ]
+
     # Return immutable settings object
     return Settings(
         data_provider=data_provider,
         db_path=db_path,
         tickers=tickers,
+        write_batch_size=write_batch_size,
+        busy_timeout_ms=busy_timeout_ms,
+        db_shards=db_shards,
+        shard_workers=shard_workers,
+        corporate_actions=corporate_actions,
+        compact_dtypes=compact_dtypes,
+        interval=interval,
+        period=period,
+        resample_intervals=resample_intervals,
     )
\ No newline at end of file
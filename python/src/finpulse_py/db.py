@@ -1,26 +1,51 @@
 from __future__ import annotations
 
+import os  # Used to size the WAL side-file on disk
 import sqlite3  # Built-in SQLite library (no separate DB server needed)
-from typing import Iterable, Dict, Any  # Useful for typed row inputs
+import time  # Used to time lock waits and back off between retries
+from dataclasses import dataclass  # Simple container for write metrics
+from typing import Iterable, Dict, Any, List, Optional, Sequence, Tuple  # Useful for typed row inputs
+
+
+# ----------------------------
+# WRITER TUNING DEFAULTS
+# ----------------------------
+
+# How long SQLite itself waits on a locked database before raising "database is locked"
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+
+# How many times we retry a batch that still hit a lock after the busy timeout
+DEFAULT_MAX_RETRIES = 5
+
+# First back-off sleep between retries (doubles on each attempt)
+DEFAULT_RETRY_BACKOFF_S = 0.05
+
+# Valid modes for PRAGMA wal_checkpoint(...)
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
 
 
 # ----------------------------
 # SQL SCHEMA (TABLE DEFINITIONS)
 # ----------------------------
 
+# Bar size used when a row doesn't say otherwise (and for pre-interval databases)
+DEFAULT_INTERVAL = "1d"
+
 PRICE_SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS prices (
   ticker TEXT NOT NULL,
-  date TEXT NOT NULL,         -- stored as ISO string: YYYY-MM-DD
+  interval TEXT NOT NULL DEFAULT '1d',  -- bar size: 1m, 5m, 1h, 1d, 1wk, 1mo, ...
+  date TEXT NOT NULL,         -- ISO string: YYYY-MM-DD (daily+) or YYYY-MM-DD HH:MM:SS (intraday)
   open REAL,
   high REAL,
   low REAL,
   close REAL,
   adj_close REAL,
   volume INTEGER,
+  derived_from TEXT,          -- NULL for fetched bars, else the interval they were resampled from
 
-  -- Primary key enforces uniqueness: only one row per (ticker, date)
-  PRIMARY KEY (ticker, date)
+  -- Primary key enforces uniqueness: only one bar per (ticker, interval, date)
+  PRIMARY KEY (ticker, interval, date)
 );
 """
 
@@ -47,14 +72,45 @@ CREATE TABLE IF NOT EXISTS risk (
 );
 """
 
+CORPORATE_ACTIONS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS corporate_actions (
+  ticker TEXT NOT NULL,
+  date TEXT NOT NULL,         -- ex-date, ISO string: YYYY-MM-DD
+  action TEXT NOT NULL,       -- 'split' or 'dividend'
+  value REAL NOT NULL,        -- split: new shares per old share (4.0 = 4-for-1); dividend: cash per share
+  source TEXT NOT NULL DEFAULT 'file',  -- 'provider' (already in the provider's adj_close) or 'file'
+  applied INTEGER NOT NULL DEFAULT 1,   -- 0 until the adjusted history and derived tables are rebuilt
+  PRIMARY KEY (ticker, date, action)
+);
+"""
+
+
+@dataclass
+class WriteStats:
+    """
+    Counters collected while writing, so a pipeline run can report how much
+    it contended with readers (e.g. the Java API) for the database.
 
-def Connect(db_path: str) -> sqlite3.Connection:
+    lock_wait_seconds is the total time spent waiting to acquire the write lock.
+    wal_bytes_* are the size of the -wal file around the final checkpoint.
+    """
+    batches: int = 0
+    rows: int = 0
+    retries: int = 0
+    lock_wait_seconds: float = 0.0
+    max_lock_wait_seconds: float = 0.0
+    wal_bytes_before_checkpoint: int = 0
+    wal_bytes_after_checkpoint: int = 0
+
+
+def Connect(db_path: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS) -> sqlite3.Connection:
     """
     Opens a connection to the SQLite database file.
 
     If the file doesn't exist, SQLite creates it automatically.
+    busy_timeout_ms is how long a statement waits on a lock before failing.
     """
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000.0)
 
     # row_factory makes query results behave like dict-like rows
     # (so you can do row["ticker"] instead of row[0])
@@ -66,48 +122,276 @@ def Connect(db_path: str) -> sqlite3.Connection:
     # WAL mode improves concurrency + durability for many read/write operations
     conn.execute("PRAGMA journal_mode = WAL;")
 
+    # Wait (instead of failing immediately) when another connection holds the lock
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)};")
+
     return conn
 
 
+def WalSizeBytes(db_path: str) -> int:
+    """
+    Returns the current size of the WAL file next to db_path (0 if there is none).
+    """
+    wal_path = f"{db_path}-wal"
+    return os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
+
+def Checkpoint(conn: sqlite3.Connection, mode: str = "PASSIVE") -> Tuple[int, int, int]:
+    """
+    Runs PRAGMA wal_checkpoint(mode) and returns (busy, wal_frames, checkpointed_frames).
+
+    - PASSIVE copies what it can without waiting on readers (never blocks them).
+    - TRUNCATE waits for readers, then resets the WAL file to zero bytes.
+    """
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unsupported checkpoint mode={mode}. Use one of {CHECKPOINT_MODES}.")
+
+    # A checkpoint cannot run inside an open write transaction
+    if conn.in_transaction:
+        conn.commit()
+
+    row = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+    return int(row[0]), int(row[1]), int(row[2])
+
+
+def _IsLockError(exc: sqlite3.OperationalError) -> bool:
+    """True when SQLite gave up waiting on another connection's lock."""
+    msg = str(exc).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def _WriteInTransaction(
+    conn: sqlite3.Connection,
+    statements: Sequence[Tuple[str, Sequence[Tuple[Any, ...]]]],
+    stats: WriteStats,
+    max_retries: int,
+) -> int:
+    """
+    Runs every (sql, rows) statement in one transaction: all of them commit or none do.
+
+    BEGIN IMMEDIATE grabs the write lock up front, so the time it takes is the
+    lock wait. If the busy timeout still expires we back off and retry.
+    """
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+        except sqlite3.OperationalError as exc:
+            waited = time.perf_counter() - started
+            stats.lock_wait_seconds += waited
+            stats.max_lock_wait_seconds = max(stats.max_lock_wait_seconds, waited)
+            if not _IsLockError(exc) or attempt >= max_retries:
+                raise
+            attempt += 1
+            stats.retries += 1
+            time.sleep(DEFAULT_RETRY_BACKOFF_S * (2 ** (attempt - 1)))
+            continue
+
+        waited = time.perf_counter() - started
+        stats.lock_wait_seconds += waited
+        stats.max_lock_wait_seconds = max(stats.max_lock_wait_seconds, waited)
+
+        total = 0
+        try:
+            cur = conn.cursor()
+            for sql, rows in statements:
+                cur.executemany(sql, rows)
+                total += cur.rowcount if cur.rowcount is not None and cur.rowcount >= 0 else 0
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        stats.batches += 1
+        stats.rows += sum(len(rows) for _, rows in statements)
+        return total
+
+
+def _WriteChunk(
+    conn: sqlite3.Connection,
+    sql: str,
+    chunk: Sequence[Tuple[Any, ...]],
+    stats: WriteStats,
+    max_retries: int,
+) -> int:
+    """Writes one chunk in its own short transaction."""
+    return _WriteInTransaction(conn, [(sql, chunk)], stats, max_retries)
+
+
+def _WriteBatched(
+    conn: sqlite3.Connection,
+    sql: str,
+    payload: List[Tuple[Any, ...]],
+    batch_size: Optional[int],
+    stats: Optional[WriteStats],
+    max_retries: int,
+) -> int:
+    """
+    Writes payload in transactions of at most batch_size rows.
+
+    Small transactions keep each write-lock hold short, so readers never see a
+    long stall and the WAL can be checkpointed between batches.
+    batch_size=None (or <= 0) writes everything in a single transaction.
+    """
+    if not payload:
+        return 0
+
+    stats = stats if stats is not None else WriteStats()
+    size = batch_size if batch_size and batch_size > 0 else len(payload)
+
+    # Finish any transaction the caller left open so BEGIN IMMEDIATE can succeed
+    if conn.in_transaction:
+        conn.commit()
+
+    total = 0
+    for start in range(0, len(payload), size):
+        total += _WriteChunk(conn, sql, payload[start:start + size], stats, max_retries)
+    return total
+
+
 def InitDb(conn: sqlite3.Connection) -> None:
     """
     Creates required tables if they do not exist.
     Safe to run every time (idempotent).
     """
     conn.execute(PRICE_SCHEMA_SQL)
+    _MigratePricesInterval(conn)
+    _MigratePricesDerivedFrom(conn)
     conn.execute(ANALYTICS_SCHEMA_SQL)
     conn.execute(RISK_SCHEMA_SQL)
+    conn.execute(CORPORATE_ACTIONS_SCHEMA_SQL)
+    _MigrateCorporateActionColumns(conn)
     conn.commit()  # Persist schema changes
 
 
-def UpsertPrices(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> int:
+def _MigratePricesInterval(conn: sqlite3.Connection) -> None:
     """
-    Inserts or updates price rows.
+    Upgrades a prices table created before bars had an interval.
+
+    The primary key changes, so SQLite needs the table rebuilt: existing rows
+    are copied over as DEFAULT_INTERVAL bars.
+    """
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(prices);").fetchall()}
+    if "interval" in cols:
+        return
+
+    # Do the rebuild in one transaction so a crash can't leave half a table
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE;")
+    conn.execute("ALTER TABLE prices RENAME TO prices_old;")
+    conn.execute(PRICE_SCHEMA_SQL)
+    conn.execute(
+        """
+        INSERT INTO prices (ticker, interval, date, open, high, low, close, adj_close, volume)
+        SELECT ticker, ?, date, open, high, low, close, adj_close, volume FROM prices_old;
+        """,
+        (DEFAULT_INTERVAL,),
+    )
+    conn.execute("DROP TABLE prices_old;")
 
-    Why "upsert"?
-    - If you rerun ingestion, you don't want duplicates.
-    - You want the latest data to overwrite old values safely.
 
-    PRIMARY KEY (ticker, date) enables ON CONFLICT upsert.
+def _MigratePricesDerivedFrom(conn: sqlite3.Connection) -> None:
     """
-    sql = """
-    INSERT INTO prices (ticker, date, open, high, low, close, adj_close, volume)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ON CONFLICT(ticker, date) DO UPDATE SET
-      open=excluded.open,
-      high=excluded.high,
-      low=excluded.low,
-      close=excluded.close,
-      adj_close=excluded.adj_close,
-      volume=excluded.volume;
+    Adds derived_from to a prices table created before it existed.
+
+    Until now 1wk/1mo bars were only ever resampled from daily bars, so they
+    are marked as such; everything else counts as fetched.
+    """
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(prices);").fetchall()}
+    if "derived_from" in cols:
+        return
+    conn.execute("ALTER TABLE prices ADD COLUMN derived_from TEXT;")
+    conn.execute("UPDATE prices SET derived_from = '1d' WHERE interval IN ('1wk', '1mo');")
+
+
+def _MigrateCorporateActionColumns(conn: sqlite3.Connection) -> None:
+    """
+    Adds source/applied to a corporate_actions table created before they
+    existed. Old rows count as file actions that were already applied.
     """
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(corporate_actions);").fetchall()}
+    if "source" not in cols:
+        conn.execute("ALTER TABLE corporate_actions ADD COLUMN source TEXT NOT NULL DEFAULT 'file';")
+    if "applied" not in cols:
+        conn.execute("ALTER TABLE corporate_actions ADD COLUMN applied INTEGER NOT NULL DEFAULT 1;")
+
+
+def FetchPrices(
+    conn: sqlite3.Connection,
+    ticker: str,
+    interval: str = DEFAULT_INTERVAL,
+    start: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Reads stored bars for one ticker/interval (optionally from start onward), oldest first.
+    """
+    sql = (
+        "SELECT ticker, interval, date, open, high, low, close, adj_close, volume "
+        "FROM prices WHERE ticker = ? AND interval = ?"
+    )
+    params: List[Any] = [ticker, interval]
+
+    if start is not None:
+        sql += " AND date >= ?"
+        params.append(start)
+
+    sql += " ORDER BY date ASC"
+    return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def FetchBarSources(
+    conn: sqlite3.Connection,
+    ticker: str,
+    interval: str,
+    start: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Maps date -> derived_from for stored bars of one ticker/interval
+    (None = fetched at that interval).
+    """
+    sql = "SELECT date, derived_from FROM prices WHERE ticker = ? AND interval = ?"
+    params: List[Any] = [ticker, interval]
+
+    if start is not None:
+        sql += " AND date >= ?"
+        params.append(start)
+
+    return {r[0]: r[1] for r in conn.execute(sql, params).fetchall()}
+
+
+def FirstBarDate(conn: sqlite3.Connection, ticker: str, interval: str) -> Optional[str]:
+    """Date of the oldest stored bar for one ticker/interval, or None if there is none."""
+    row = conn.execute(
+        "SELECT MIN(date) FROM prices WHERE ticker = ? AND interval = ?", (ticker, interval)
+    ).fetchone()
+    return row[0] if row else None
+
+
+UPSERT_PRICES_SQL = """
+INSERT INTO prices (ticker, interval, date, open, high, low, close, adj_close, volume, derived_from)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(ticker, interval, date) DO UPDATE SET
+  open=excluded.open,
+  high=excluded.high,
+  low=excluded.low,
+  close=excluded.close,
+  adj_close=excluded.adj_close,
+  volume=excluded.volume,
+  derived_from=excluded.derived_from;
+"""
+
 
-    # Convert dict rows into ordered tuples matching the SQL placeholders
+def _PricePayload(rows: Iterable[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    """Converts dict rows into ordered tuples matching UPSERT_PRICES_SQL."""
     payload = []
     for r in rows:
         payload.append(
             (
                 r["ticker"],        # required
+                r.get("interval") or DEFAULT_INTERVAL,
                 r["date"],          # required ISO string
                 r.get("open"),      # optional
                 r.get("high"),
@@ -115,18 +399,44 @@ def UpsertPrices(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> in
                 r.get("close"),
                 r.get("adj_close"),
                 r.get("volume"),
+                r.get("derived_from"),  # None = fetched bar
             )
         )
+    return payload
 
-    cur = conn.cursor()          # Cursor executes SQL statements
-    cur.executemany(sql, payload) # Efficient bulk insert/update
-    conn.commit()                # Save changes to disk
 
+def UpsertPrices(
+    conn: sqlite3.Connection,
+    rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> int:
+    """
+    Inserts or updates price rows.
+
+    Why "upsert"?
+    - If you rerun ingestion, you don't want duplicates.
+    - You want the latest data to overwrite old values safely.
+
+    PRIMARY KEY (ticker, interval, date) enables ON CONFLICT upsert.
+    Rows without an "interval" key are stored as DEFAULT_INTERVAL bars.
+
+    batch_size bounds how many rows go into one transaction (None = all at once);
+    stats, if given, collects lock-wait and retry counters.
+    """
+    # Bulk insert/update in bounded transactions (one commit per batch);
     # rowcount is "best effort" on SQLite; still useful as feedback
-    return cur.rowcount if cur.rowcount is not None else 0
+    return _WriteBatched(conn, UPSERT_PRICES_SQL, _PricePayload(rows), batch_size, stats, max_retries)
 
 
-def UpsertAnalytics(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> int:
+def UpsertAnalytics(
+    conn: sqlite3.Connection,
+    rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> int:
     """
     Same concept as prices, but for computed analytics features.
     """
@@ -153,13 +463,16 @@ def UpsertAnalytics(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) ->
             )
         )
 
-    cur = conn.cursor()
-    cur.executemany(sql, payload)
-    conn.commit()
-    return cur.rowcount if cur.rowcount is not None else 0
+    return _WriteBatched(conn, sql, payload, batch_size, stats, max_retries)
 
 
-def UpsertRisk(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> int:
+def UpsertRisk(
+    conn: sqlite3.Connection,
+    rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> int:
     """
     Upsert per-ticker risk metrics computed as-of the latest available date.
 
@@ -187,7 +500,133 @@ def UpsertRisk(conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]]) -> int:
             )
         )
 
-    cur = conn.cursor()
-    cur.executemany(sql, payload)
-    conn.commit()
-    return cur.rowcount if cur.rowcount is not None else 0
\ No newline at end of file
+    return _WriteBatched(conn, sql, payload, batch_size, stats, max_retries)
+
+
+UPSERT_CORPORATE_ACTIONS_SQL = """
+INSERT INTO corporate_actions (ticker, date, action, value, source, applied)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(ticker, date, action) DO UPDATE SET
+  value=excluded.value,
+  source=excluded.source,
+  applied=excluded.applied;
+"""
+
+
+def _ActionPayload(rows: Iterable[Dict[str, Any]], applied: bool) -> List[Tuple[Any, ...]]:
+    """Converts dict rows into ordered tuples matching UPSERT_CORPORATE_ACTIONS_SQL."""
+    payload = []
+    for r in rows:
+        payload.append(
+            (
+                r["ticker"],
+                r["date"],
+                r["action"],
+                r["value"],
+                r.get("source") or "file",
+                int(applied),
+            )
+        )
+    return payload
+
+
+def UpsertCorporateActions(
+    conn: sqlite3.Connection,
+    rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    applied: bool = True,
+) -> int:
+    """
+    Upsert splits/dividends. A re-sent action with a corrected value overwrites the old one.
+
+    applied=False stores them as not yet reflected in the adjusted history
+    (see RewriteAdjustedHistory).
+    """
+    payload = _ActionPayload(rows, applied)
+    return _WriteBatched(conn, UPSERT_CORPORATE_ACTIONS_SQL, payload, batch_size, stats, max_retries)
+
+
+def RewriteAdjustedHistory(
+    conn: sqlite3.Connection,
+    price_rows: Iterable[Dict[str, Any]],
+    action_rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> int:
+    """
+    Stores re-adjusted bars together with the actions they were adjusted for,
+    so the stored bars always match the stored actions.
+
+    A ticker's bars and actions always share one transaction. batch_size
+    bounds the bars per transaction by grouping whole tickers (a ticker with
+    more bars than that still goes in alone); None writes everything at once.
+
+    The actions go in with applied=0; call MarkActionsApplied once everything
+    derived from the bars (resampled bars, analytics, risk) is rewritten too.
+    """
+    stats = stats if stats is not None else WriteStats()
+    if conn.in_transaction:
+        conn.commit()
+
+    # ticker -> (bars, actions), in first-seen order
+    by_ticker: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+    for r in price_rows:
+        by_ticker.setdefault(r["ticker"], ([], []))[0].append(r)
+    for r in action_rows:
+        by_ticker.setdefault(r["ticker"], ([], []))[1].append(r)
+
+    groups: List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = []
+    for bars, actions in by_ticker.values():
+        last = groups[-1] if groups else None
+        if last is not None and (not batch_size or batch_size <= 0 or len(last[0]) + len(bars) <= batch_size):
+            last[0].extend(bars)
+            last[1].extend(actions)
+        else:
+            groups.append((list(bars), list(actions)))
+
+    total = 0
+    for bars, actions in groups:
+        statements = [
+            (UPSERT_PRICES_SQL, _PricePayload(bars)),
+            (UPSERT_CORPORATE_ACTIONS_SQL, _ActionPayload(actions, applied=False)),
+        ]
+        total += _WriteInTransaction(conn, statements, stats, max_retries)
+    return total
+
+
+def MarkActionsApplied(
+    conn: sqlite3.Connection,
+    tickers: Sequence[str],
+    stats: Optional[WriteStats] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> int:
+    """Flags every stored action of the tickers as reflected in all derived data."""
+    sql = "UPDATE corporate_actions SET applied = 1 WHERE ticker = ? AND applied = 0;"
+    return _WriteBatched(conn, sql, [(t,) for t in tickers], None, stats, max_retries)
+
+
+def FetchUnappliedActionTickers(conn: sqlite3.Connection) -> List[str]:
+    """
+    Tickers with an action stored but not yet applied everywhere: a run
+    failed after rewriting their bars, so their derived data is stale.
+    """
+    sql = "SELECT DISTINCT ticker FROM corporate_actions WHERE applied = 0 ORDER BY ticker"
+    return [r[0] for r in conn.execute(sql).fetchall()]
+
+
+def FetchCorporateActionRows(conn: sqlite3.Connection, tickers: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Reads every stored corporate action for the given tickers, oldest first.
+    """
+    if not tickers:
+        return []
+
+    marks = ", ".join("?" for _ in tickers)
+    sql = (
+        "SELECT ticker, date, action, value, source FROM corporate_actions "
+        f"WHERE ticker IN ({marks}) ORDER BY ticker, date"
+    )
+    return [dict(r) for r in conn.execute(sql, list(tickers)).fetchall()]
@@ -1,25 +1,108 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Dict, List, Optional
 
 import pandas as pd
 import yfinance as yf
 
+from finpulse_py.adjust import ACTION_COLUMNS
+from finpulse_py.compact import CompactPrices
+from finpulse_py.resample import FormatBarDates
+
+# How far back Yahoo serves each intraday bar size (days); longer periods
+# come back empty. Daily and coarser bars go back decades.
+YAHOO_MAX_PERIOD_DAYS: Dict[str, int] = {
+    "1m": 7,
+    "2m": 60,
+    "5m": 60,
+    "15m": 60,
+    "30m": 60,
+    "90m": 60,
+    "60m": 730,
+    "1h": 730,
+}
+
+# yfinance period units -> days (upper bound, so the limit check stays safe)
+_PERIOD_UNIT_DAYS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+
+def _PeriodDays(period: str) -> float:
+    """
+    Length of a yfinance period string in days ("60d" -> 60, "2y" -> 732).
+    "max" is unbounded; "ytd" is at most one year.
+    """
+    if period == "max":
+        return float("inf")
+    if period == "ytd":
+        return 366.0
+    for unit, days in _PERIOD_UNIT_DAYS.items():
+        n = period[: -len(unit)]
+        if period.endswith(unit) and n.isdigit():
+            return float(int(n) * days)
+    raise ValueError(f"Unknown PERIOD={period}. Use e.g. 7d, 60d, 6mo, 2y, ytd or max.")
+
+
+def ResolvePeriod(period: str, interval: str) -> str:
+    """
+    Returns the download period for an interval.
+
+    - period "" picks the longest window Yahoo serves for the interval
+      (7d for 1m, 60d for 5m, 730d for 1h, 2y for daily and coarser)
+    - an explicit period is checked against the same limit
+    """
+    max_days = YAHOO_MAX_PERIOD_DAYS.get(interval)
+
+    if not period:
+        return f"{max_days}d" if max_days is not None else "2y"
+
+    days = _PeriodDays(period)
+    if max_days is not None and days > max_days:
+        raise ValueError(
+            f"PERIOD={period} is longer than Yahoo serves for INTERVAL={interval} "
+            f"(at most {max_days}d)."
+        )
+    return period
+
+
+# yfinance period units -> calendar offset, for windows counted back from a date
+_PERIOD_UNIT_OFFSET = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def PeriodStart(period: str, end: pd.Timestamp) -> Optional[pd.Timestamp]:
+    """
+    First date a yfinance period covers when it ends on `end`
+    ("3mo" ending 2024-03-28 -> 2023-12-28). None for "max" (no bound).
+    """
+    end = pd.Timestamp(end)
+    if period == "max":
+        return None
+    if period == "ytd":
+        return end.normalize().replace(month=1, day=1)
+    for unit, name in _PERIOD_UNIT_OFFSET.items():
+        n = period[: -len(unit)]
+        if period.endswith(unit) and n.isdigit():
+            return end - pd.DateOffset(**{name: int(n)})
+    raise ValueError(f"Unknown PERIOD={period}. Use e.g. 7d, 60d, 6mo, 2y, ytd or max.")
+
 
 def FetchOhlcv(
     tickers: List[str],
     period: str = "2y",
     interval: str = "1d",
+    compact: bool = False,
 ) -> pd.DataFrame:
     """
-    Fetch daily OHLCV price data for the tickers.
+    Fetch OHLCV bars of the given interval (1d by default) for the tickers.
 
     Returns a DataFrame with columns:
-      ticker, date, open, high, low, close, adj_close, volume
+      ticker, interval, date, open, high, low, close, adj_close, volume
 
     Notes:
     - I store `date` as an ISO string because SQLite handles strings easily.
+      Intraday intervals keep the time of day too (YYYY-MM-DD HH:MM:SS).
     - yfinance does not require API keys.
+    - compact=True returns the memory-compact dtypes from CompactPrices
+      (categorical ticker, datetime64 date, float32 prices, unsigned volume).
     """
     # Download data from Yahoo Finance through yfinance
     # For multiple tickers, this returns a DataFrame with MultiIndex columns:
@@ -77,7 +160,12 @@ def FetchOhlcv(
     out = out.rename(columns={"adj close": "adj_close"})
 
     # Convert date column to ISO string for SQLite storage
-    out["date"] = pd.to_datetime(out["Date"]).dt.date.astype(str) if "Date" in out.columns else pd.to_datetime(out["date"]).dt.date.astype(str)
+    # (intraday downloads name the index "Datetime" instead of "Date")
+    date_col = next(c for c in ("Datetime", "Date", "datetime", "date") if c in out.columns)
+    out["date"] = FormatBarDates(out[date_col], interval)
+
+    # Tag every bar with its size so intraday and daily bars never collide
+    out["interval"] = interval
 
     # yfinance output columns usually: Open High Low Close Adj Close Volume
     # Normalize to our schema names
@@ -101,7 +189,96 @@ def FetchOhlcv(
     out = out.dropna(subset=["close"])
 
     # Keep only the columns our DB expects
-    keep_cols = ["ticker", "date", "open", "high", "low", "close", "adj_close", "volume"]
+    keep_cols = ["ticker", "interval", "date", "open", "high", "low", "close", "adj_close", "volume"]
     out = out[keep_cols]
 
-    return out
\ No newline at end of file
+    return CompactPrices(out) if compact else out
+
+
+def FetchCorporateActions(tickers: List[str], include_splits: bool = False) -> pd.DataFrame:
+    """
+    Fetch splits and dividends for the tickers from Yahoo Finance.
+
+    Returns a DataFrame with columns:
+      ticker, date, action ('split' | 'dividend'), value, source ('provider')
+
+    Notes:
+    - Yahoo's Close is already split-adjusted, so splits are left out by
+      default; adjusting for them again would shrink old prices twice.
+      Pass include_splits=True for a provider whose closes are raw.
+    """
+    frames = []
+
+    for t in tickers:
+        # .actions has a Date index and "Dividends" / "Stock Splits" columns
+        acts = yf.Ticker(t).actions
+        if acts is None or acts.empty:
+            continue
+
+        acts = acts.reset_index()
+        dates = FormatBarDates(acts["Date"], "1d")
+
+        divs = acts["Dividends"] > 0
+        frames.append(
+            pd.DataFrame(
+                {
+                    "ticker": t,
+                    "date": dates[divs],
+                    "action": "dividend",
+                    "value": acts.loc[divs, "Dividends"],
+                    "source": "provider",
+                }
+            )
+        )
+
+        if include_splits and "Stock Splits" in acts.columns:
+            splits = acts["Stock Splits"] > 0
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "ticker": t,
+                        "date": dates[splits],
+                        "action": "split",
+                        "value": acts.loc[splits, "Stock Splits"],
+                        "source": "provider",
+                    }
+                )
+            )
+
+    if not frames:
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+
+    return pd.concat(frames, ignore_index=True)[ACTION_COLUMNS]
+
+
+def ReadCorporateActionsFile(path: str) -> pd.DataFrame:
+    """
+    Read splits/dividends from a local CSV with columns:
+      ticker, date, action, value
+
+    e.g.
+      AAPL,2024-05-10,dividend,0.25
+
+    They are applied on top of the provider's adj_close (source "file").
+    Splits only belong here for a provider whose closes aren't already
+    split-adjusted; Yahoo's are, so the pipeline rejects them for yfinance.
+    """
+    out = pd.read_csv(path)
+    out.columns = [c.strip().lower() for c in out.columns]
+
+    missing = [c for c in ACTION_COLUMNS if c != "source" and c not in out.columns]
+    if missing:
+        raise ValueError(f"Corporate actions file {path} is missing columns {missing}.")
+
+    # Normalize the same way as price data so rows match on (ticker, date)
+    out["ticker"] = out["ticker"].astype(str).str.strip().str.upper()
+    out["date"] = FormatBarDates(out["date"], "1d")
+    out["action"] = out["action"].astype(str).str.strip().str.lower()
+    out["value"] = out["value"].astype(float)
+    out["source"] = "file"
+
+    bad = sorted(set(out["action"]) - {"split", "dividend"})
+    if bad:
+        raise ValueError(f"Unsupported corporate actions {bad} in {path}. Use split or dividend.")
+
+    return out[ACTION_COLUMNS]
@@ -1,102 +1,425 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any, Optional
+import sqlite3
+from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 # Import the modules we already built
 from finpulse_py.config import Settings
-from finpulse_py.ingest import FetchOhlcv
+from finpulse_py.ingest import (
+    FetchOhlcv,
+    FetchCorporateActions,
+    PeriodStart,
+    ReadCorporateActionsFile,
+    ResolvePeriod,
+)
+from finpulse_py.adjust import (
+    ACTION_COLUMNS,
+    ActionsToApply,
+    ApplyAdjustments,
+    LoadCorporateActions,
+    LoadStoredBars,
+    MergeActions,
+    RemoveFileAdjustments,
+)
 from finpulse_py.transform import ComputeAnalytics, ComputeRisk
-from finpulse_py.db import Connect, InitDb, UpsertPrices, UpsertAnalytics, UpsertRisk
+from finpulse_py.compact import CompactPrices, ToDbRecords
+from finpulse_py.resample import CanResample, IsIntraday, MaterializeResampled, ResampleBars
+from finpulse_py.shard import MergeStats, OpenShards, RunOnShards, ShardIndex, ShardSet
+from finpulse_py.db import (
+    UpsertPrices,
+    UpsertAnalytics,
+    UpsertRisk,
+    RewriteAdjustedHistory,
+    MarkActionsApplied,
+    Checkpoint,
+    WalSizeBytes,
+    WriteStats,
+)
 
+# Daily bars a ticker needs before analytics/risk built from intraday bars
+# are stored (the MA50 window); shorter windows would overwrite the values
+# a daily run computed from years of history.
+MIN_DAILY_BARS = 50
 
-def RunPipeline(settings: Settings) -> Dict[str, Any]:
+
+def _FullWindowOnly(daily_df: pd.DataFrame, min_bars: int = MIN_DAILY_BARS) -> pd.DataFrame:
+    """Keeps only tickers with at least min_bars daily bars."""
+    if daily_df.empty:
+        return daily_df
+    counts = daily_df.groupby("ticker", observed=True)["date"].transform("size")
+    return daily_df[counts >= min_bars]
+
+
+def _TrailingWindow(daily_df: pd.DataFrame, period: str) -> pd.DataFrame:
     """
-    Orchestrates the whole pipeline:
-      1) Connect to DB and ensure schema exists
-      2) Fetch OHLCV data for tickers
-      3) Upsert prices into DB (idempotent)
-      4) Compute analytics (returns, moving averages, volatility)
-      5) Upsert analytics into DB
-      6) Compute risk metrics (VaR, Sharpe, Max Drawdown)
-      7) Upsert risk metrics into DB
+    Keeps each ticker's bars within `period` of its latest bar: the window a
+    normal fetch of that period covers.
+    """
+    if daily_df.empty:
+        return daily_df
+    dates = pd.to_datetime(daily_df["date"])
+    last = dates.groupby(daily_df["ticker"], observed=True).transform("max")
+    starts = last.map(lambda end: PeriodStart(period, end))
+    return daily_df[starts.isna() | (dates >= starts)]
 
-    Returns a summary dict which we print in main.py.
+
+def _StoreBars(
+    conn: sqlite3.Connection,
+    db_path: str,
+    settings: Settings,
+    prices_df: pd.DataFrame,
+    stats: WriteStats,
+    actions_df: Optional[pd.DataFrame] = None,
+) -> Dict[str, int]:
     """
+    Writes one batch of fetched bars and everything derived from them
+    (steps 4-8 of RunPipeline) to a single database file.
+
+    All of a ticker's work stays on one connection, which is what lets
+    RunPipeline run this once per shard in parallel.
+
+    If actions_df brings new or changed splits/dividends, the affected
+    tickers' whole stored history is pulled in and rewritten too; every
+    other ticker only gets the new bars.
+    """
+    # --- Corporate actions: find tickers whose adjusted history is now stale ---
+    # Nothing is written yet: the actions are only stored together with the
+    # bars adjusted for them, so a failed run gets retried in full next time.
+    changed, affected = ActionsToApply(conn, actions_df)
+    tickers = set(affected)
+    if not prices_df.empty:
+        tickers.update(prices_df["ticker"].astype(str).unique())
+    stored_actions = LoadCorporateActions(conn, sorted(tickers))
+
+    if affected:
+        stored = LoadStoredBars(conn, affected, settings.interval)
+
+        # Stored bars carry the stored file actions; take those off before
+        # applying the new set
+        stored = RemoveFileAdjustments(stored, stored_actions)
+        if settings.compact_dtypes:
+            stored = CompactPrices(stored)
+        prices_df = pd.concat([stored, prices_df], ignore_index=True)
+
+        # Freshly fetched bars win over the stored copy of the same bar
+        prices_df = prices_df.drop_duplicates(["ticker", "date"], keep="last")
+
+        # concat of categoricals with different categories falls back to object
+        if settings.compact_dtypes:
+            prices_df = CompactPrices(prices_df)
+
+    if prices_df.empty:
+        return {"prices": 0, "resampled": 0, "analytics": 0, "risk": 0, "rebuilt": 0}
+
+    # Adjust adj_close for the stored + new actions (back-adjustment);
+    # tickers without any keep the provider's adj_close
+    prices_df = ApplyAdjustments(prices_df, MergeActions(stored_actions, changed))
 
-    # --- 1) Connect to the database ---
-    # This opens (or creates) the SQLite file at settings.db_path
-    conn = Connect(settings.db_path)
+    # --- 4) Convert price DataFrame -> list of dict rows for DB upsert ---
+    # records = [{"ticker": "...", "date": "...", ...}, ...]
+    price_rows: List[Dict[str, Any]] = ToDbRecords(prices_df, settings.interval)
 
-    try:
-        # --- 2) Initialize schema (safe to run every time) ---
-        InitDb(conn)
+    # --- 5) Upsert prices into the DB (idempotent) ---
+    # Rebuilt tickers: each one's history commits together with the actions
+    # it was adjusted for; whole tickers are grouped into bounded batches
+    rebuilt = set(affected)
+    prices_count = 0
+    if rebuilt:
+        prices_count += RewriteAdjustedHistory(
+            conn,
+            [r for r in price_rows if r["ticker"] in rebuilt],
+            changed.to_dict(orient="records"),
+            batch_size=settings.write_batch_size,
+            stats=stats,
+        )
+    prices_count += UpsertPrices(
+        conn,
+        [r for r in price_rows if r["ticker"] not in rebuilt],
+        batch_size=settings.write_batch_size,
+        stats=stats,
+    )
 
-        # --- 3) Fetch raw price data from the provider ---
-        # For MVP, I am only support yfinance, but I keep the provider concept
-        # so I can swap to Alpha Vantage later with minimal change.
-        if settings.data_provider != "yfinance":
-            raise ValueError(
-                f"Unsupported DATA_PROVIDER={settings.data_provider}. "
-                "For MVP, use yfinance."
+    # Derive coarser bars locally instead of downloading them again.
+    # Only buckets touched by the new bars are rebuilt.
+    resampled_count = 0
+    for target in settings.resample_intervals:
+        if CanResample(settings.interval, target):
+            resampled_count += MaterializeResampled(
+                conn,
+                prices_df,
+                target,
+                batch_size=settings.write_batch_size,
+                stats=stats,
             )
 
-        prices_df = FetchOhlcv(settings.tickers)
-
-        # If I got no data, return early so I don’t crash on transforms
-        if prices_df.empty:
-            return {
-                "tickers_requested": settings.tickers,
-                "tickers_loaded": [],
-                "prices_rows_upserted": 0,
-                "analytics_rows_upserted": 0,
-                "risk_rows_upserted": 0,
-                "message": "No price data returned from provider.",
-            }
-
-        # --- 4) Convert price DataFrame -> list of dict rows for DB upsert ---
-        # records = [{"ticker": "...", "date": "...", ...}, ...]
-        price_rows: List[Dict[str, Any]] = prices_df.to_dict(orient="records")
-
-        # --- 5) Upsert prices into the DB (idempotent) ---
-        prices_count = UpsertPrices(conn, price_rows)
-
-        # --- 6) Compute analytics (daily return, MA20, MA50, VOL20) ---
-        analytics_df = ComputeAnalytics(prices_df)
-
-        # Some columns may be NaN early in the time series (like MA50)
-        # We can still store them; SQLite supports NULL values.
-        analytics_rows: List[Dict[str, Any]] = (
-            analytics_df.to_dict(orient="records") if not analytics_df.empty else []
+    # Analytics and risk are defined on daily bars; build them from
+    # intraday bars if that's what we fetched. Intraday history is short
+    # (7-60 days for most bar sizes), so only tickers with a full MA50
+    # window get them.
+    intraday = IsIntraday(settings.interval)
+    if settings.interval == "1d":
+        daily_df = prices_df
+    elif intraday:
+        daily_df = _FullWindowOnly(ResampleBars(prices_df, "1d"))
+    else:
+        daily_df = pd.DataFrame()
+
+    # --- 6) Compute analytics (daily return, MA20, MA50, VOL20) ---
+    # Adjusted closes, so splits/dividends don't look like returns or drawdowns
+    analytics_df = ComputeAnalytics(daily_df, price_col="adj_close")
+
+    # From intraday bars, skip the warm-up rows: their MA50 is NULL and would
+    # replace a value a daily run already stored for that date
+    if intraday and not analytics_df.empty:
+        analytics_df = analytics_df[analytics_df["ma50"].notna()]
+
+    # Some columns may be NaN early in the time series (like MA50)
+    # We can still store them; SQLite supports NULL values.
+    analytics_rows: List[Dict[str, Any]] = (
+        ToDbRecords(analytics_df, "1d") if not analytics_df.empty else []
+    )
+
+    analytics_count = (
+        UpsertAnalytics(
+            conn, analytics_rows, batch_size=settings.write_batch_size, stats=stats
+        )
+        if analytics_rows
+        else 0
+    )
+
+    # --- 7) Compute risk metrics per ticker ---
+    # This returns one row per ticker (as-of latest date).
+    # Rebuilt tickers bring their whole stored history; risk still covers
+    # only the window a fetch covers, so an action doesn't move the metrics.
+    risk_input = daily_df
+    if rebuilt and not daily_df.empty:
+        is_rebuilt = daily_df["ticker"].astype(str).isin(rebuilt)
+        period = ResolvePeriod(settings.period, settings.interval)
+        risk_input = pd.concat(
+            [daily_df[~is_rebuilt], _TrailingWindow(daily_df[is_rebuilt], period)]
+        )
+    risk_df = ComputeRisk(risk_input, price_col="adj_close")
+
+    risk_rows: List[Dict[str, Any]] = (
+        risk_df.to_dict(orient="records") if not risk_df.empty else []
+    )
+
+    risk_count = (
+        UpsertRisk(conn, risk_rows, batch_size=settings.write_batch_size, stats=stats)
+        if risk_rows
+        else 0
+    )
+
+    # Only now are the rebuilt tickers' actions reflected everywhere
+    MarkActionsApplied(conn, affected, stats=stats)
+
+    # --- 8) Checkpoint the WAL ---
+    # PASSIVE first: copies pages back without ever blocking readers.
+    # TRUNCATE then waits (up to the busy timeout) for readers to move on
+    # and resets the -wal file to zero bytes.
+    stats.wal_bytes_before_checkpoint = WalSizeBytes(db_path)
+    Checkpoint(conn, "PASSIVE")
+    Checkpoint(conn, "TRUNCATE")
+    stats.wal_bytes_after_checkpoint = WalSizeBytes(db_path)
+
+    return {
+        "prices": prices_count,
+        "resampled": resampled_count,
+        "analytics": analytics_count,
+        "risk": risk_count,
+        "rebuilt": len(affected),
+    }
+
+
+def _LoadCorporateActions(settings: Settings, tickers: List[str]) -> pd.DataFrame:
+    """
+    Reads splits/dividends from the configured source:
+      ""          -> none (adj_close is whatever the provider sent)
+      "provider"  -> the data provider (yfinance)
+      a file path -> a local CSV (see ReadCorporateActionsFile)
+    """
+    source = settings.corporate_actions
+    if not source:
+        return pd.DataFrame(columns=ACTION_COLUMNS)
+    if source == "provider":
+        return FetchCorporateActions(tickers)
+    return ReadCorporateActionsFile(source)
+
+
+def _CheckActionsForProvider(settings: Settings, actions_df: pd.DataFrame) -> None:
+    """
+    Rejects file splits for yfinance: its close is already split-adjusted,
+    so applying a split again would divide older prices a second time.
+    """
+    if settings.data_provider != "yfinance" or actions_df.empty:
+        return
+
+    from_file = actions_df["source"].ne("provider") if "source" in actions_df.columns else True
+    splits = actions_df[(actions_df["action"] == "split") & from_file]
+    if not splits.empty:
+        raise ValueError(
+            f"Split rows for {sorted(splits['ticker'].unique())} can't be used with "
+            "DATA_PROVIDER=yfinance: Yahoo prices are already split-adjusted."
         )
 
-        analytics_count = UpsertAnalytics(conn, analytics_rows) if analytics_rows else 0
 
-        # --- 7) Compute risk metrics per ticker ---
-        # This returns one row per ticker (as-of latest date)
-        risk_df = ComputeRisk(prices_df)
+def _StoreShard(
+    conn: sqlite3.Connection,
+    i: int,
+    part: Tuple[str, Settings, pd.DataFrame, pd.DataFrame],
+) -> Tuple[Dict[str, int], WriteStats]:
+    """
+    Shard worker for _RunShards: runs _StoreBars on one shard and hands its
+    counts and write stats back (it may run in another process).
+    """
+    db_path, settings, prices_df, actions_df = part
+    stats = WriteStats()
+    return _StoreBars(conn, db_path, settings, prices_df, stats, actions_df), stats
+
+
+def _RunShards(
+    shards: ShardSet,
+    settings: Settings,
+    prices_df: pd.DataFrame,
+    actions_df: pd.DataFrame,
+) -> Dict[str, Any]:
+    """
+    Routes bars and actions to their shard (hash of ticker) and runs
+    _StoreBars on every shard in parallel. Returns summed counts + stats.
+    """
+    def Split(frame: pd.DataFrame) -> List[pd.DataFrame]:
+        if frame.empty:
+            return [frame] * shards.count
+        # map() on a categorical ticker only hashes each distinct ticker once
+        ids = np.asarray(frame["ticker"].map(lambda t: ShardIndex(t, shards.count)), dtype=np.int64)
+        return [frame[ids == i] for i in range(shards.count)]
+
+    price_parts = Split(prices_df)
+    action_parts = Split(actions_df)
+
+    # Shards with neither new bars nor new actions have nothing to do
+    parts = [
+        (shards.paths[i], settings, price_parts[i], action_parts[i])
+        if not (price_parts[i].empty and action_parts[i].empty)
+        else None
+        for i in range(shards.count)
+    ]
+
+    results = [
+        r
+        for r in RunOnShards(shards, parts, _StoreShard, workers=settings.shard_workers)
+        if r is not None
+    ]
+    counts = [c for c, _ in results]
+
+    # Each shard collected its own lock wait / retry counters
+    stats = MergeStats(WriteStats(), [s for _, s in results])
+
+    return {
+        "prices_rows_upserted": sum(c["prices"] for c in counts),
+        "resampled_rows_upserted": sum(c["resampled"] for c in counts),
+        "analytics_rows_upserted": sum(c["analytics"] for c in counts),
+        "risk_rows_upserted": sum(c["risk"] for c in counts),
+        "tickers_rebuilt": sum(c["rebuilt"] for c in counts),
+        "db_path": settings.db_path,
+        "db_shards": shards.count,
+        "write_batches": stats.batches,
+        "write_retries": stats.retries,
+        "lock_wait_seconds": round(stats.lock_wait_seconds, 4),
+        "max_lock_wait_seconds": round(stats.max_lock_wait_seconds, 4),
+        "wal_bytes_before_checkpoint": stats.wal_bytes_before_checkpoint,
+        "wal_bytes_after_checkpoint": stats.wal_bytes_after_checkpoint,
+    }
+
+
+def RunPipeline(settings: Settings) -> Dict[str, Any]:
+    """
+    Orchestrates the whole pipeline:
+      1) Open the DB (or its shards) and ensure schema exists
+      2) Fetch OHLCV data for tickers
+      3) Route each ticker's bars to its shard (one shard = plain DB_PATH)
+      4-5) Upsert prices into DB (idempotent), then rebuild the coarser
+         settings.resample_intervals bars touched by the new ones
+      6) Compute + upsert analytics (returns, moving averages, volatility)
+      7) Compute + upsert risk metrics (VaR, Sharpe, Max Drawdown)
+      8) Checkpoint the WAL so it doesn't grow without bound
+
+    Writes go in bounded transactions (settings.write_batch_size rows each)
+    so readers like the Java API only ever wait on short write locks.
+    With settings.db_shards > 1, steps 4-8 run on every shard in parallel.
 
-        risk_rows: List[Dict[str, Any]] = (
-            risk_df.to_dict(orient="records") if not risk_df.empty else []
+    Returns a summary dict which we print in main.py.
+    """
+
+    # --- 1) Open the database files and initialize schema (safe to run every time) ---
+    # This opens (or creates) settings.db_path, or one file per shard
+    shards = OpenShards(settings.db_path, settings.db_shards, settings.busy_timeout_ms)
+
+    # --- 2) Fetch raw price data from the provider ---
+    # For MVP, I am only support yfinance, but I keep the provider concept
+    # so I can swap to Alpha Vantage later with minimal change.
+    if settings.data_provider != "yfinance":
+        raise ValueError(
+            f"Unsupported DATA_PROVIDER={settings.data_provider}. "
+            "For MVP, use yfinance."
         )
 
-        risk_count = UpsertRisk(conn, risk_rows) if risk_rows else 0
+    # Intraday bars only go back so far (7 days for 1m, 60 for 5m), so the
+    # period follows the interval unless PERIOD overrides it
+    period = ResolvePeriod(settings.period, settings.interval)
 
-        # Determine which tickers actually got loaded (some might fail)
-        loaded_tickers = sorted(prices_df["ticker"].unique().tolist())
+    prices_df = FetchOhlcv(
+        settings.tickers,
+        period=period,
+        interval=settings.interval,
+        compact=settings.compact_dtypes,
+    )
 
-        # Return a nice summary for printing/logging
+    # If I got no data, return early so I don’t crash on transforms
+    if prices_df.empty:
         return {
             "tickers_requested": settings.tickers,
-            "tickers_loaded": loaded_tickers,
-            "prices_rows_upserted": prices_count,
-            "analytics_rows_upserted": analytics_count,
-            "risk_rows_upserted": risk_count,
-            "db_path": settings.db_path,
-            "message": "Pipeline completed successfully.",
+            "tickers_loaded": [],
+            "prices_rows_upserted": 0,
+            "resampled_rows_upserted": 0,
+            "analytics_rows_upserted": 0,
+            "risk_rows_upserted": 0,
+            "message": "No price data returned from provider.",
         }
 
-    finally:
-        # Always close the DB connection even if something fails
-        conn.close()
\ No newline at end of file
+    # Splits/dividends (if configured) travel with the bars to each shard
+    actions_df = _LoadCorporateActions(settings, settings.tickers)
+    _CheckActionsForProvider(settings, actions_df)
+
+    # --- 3-8) Route bars by shard, then store bars + derived data, one worker per shard ---
+    summary = _RunShards(shards, settings, prices_df, actions_df)
+
+    # Determine which tickers actually got loaded (some might fail)
+    loaded_tickers = sorted(prices_df["ticker"].unique().tolist())
+
+    # Return a nice summary for printing/logging
+    return {
+        "tickers_requested": settings.tickers,
+        "tickers_loaded": loaded_tickers,
+        **summary,
+        "message": "Pipeline completed successfully.",
+    }
+
+
+def ApplyCorporateActions(settings: Settings, actions_df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Applies newly arrived splits/dividends without fetching prices again.
+
+    Only tickers with a new or changed action get their stored history
+    re-adjusted and their resampled bars, analytics and risk recomputed.
+    """
+    _CheckActionsForProvider(settings, actions_df)
+
+    shards = OpenShards(settings.db_path, settings.db_shards, settings.busy_timeout_ms)
+    empty = pd.DataFrame(columns=["ticker", "date"])
+
+    summary = _RunShards(shards, settings, empty, actions_df)
+    return {**summary, "message": "Corporate actions applied."}
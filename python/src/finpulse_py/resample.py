@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from finpulse_py.db import FetchBarSources, FetchPrices, FirstBarDate, UpsertPrices, WriteStats
+
+
+# ----------------------------
+# INTERVAL DEFINITIONS
+# ----------------------------
+
+# Intraday bar sizes (yfinance names) -> length in minutes
+INTRADAY_MINUTES: Dict[str, int] = {
+    "1m": 1,
+    "2m": 2,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "60m": 60,
+    "90m": 90,
+    "1h": 60,
+}
+
+# Calendar bar sizes, from finest to coarsest
+CALENDAR_ORDER: List[str] = ["1d", "1wk", "1mo"]
+
+# How OHLCV columns combine when several fine bars make one coarse bar
+BAR_AGG = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "adj_close": "last",
+    "volume": "sum",
+}
+
+BAR_COLUMNS = ["ticker", "interval", "date", "open", "high", "low", "close", "adj_close", "volume"]
+
+
+def IsIntraday(interval: str) -> bool:
+    """True for bar sizes shorter than a day (1m, 5m, 1h, ...)."""
+    return interval in INTRADAY_MINUTES
+
+
+def _Rank(interval: str) -> float:
+    """
+    Orders intervals on one scale (minutes for intraday, then 1d < 1wk < 1mo)
+    so we can tell if one is coarser than another.
+    """
+    if interval in INTRADAY_MINUTES:
+        return float(INTRADAY_MINUTES[interval])
+    if interval in CALENDAR_ORDER:
+        return 24 * 60 * (1 + CALENDAR_ORDER.index(interval))
+    raise ValueError(f"Unknown interval={interval}.")
+
+
+def CanResample(source: str, target: str) -> bool:
+    """
+    True if target bars can be built exactly from source bars.
+
+    Target must be coarser, and every source bar must fall inside a single
+    target bar: for intraday -> intraday the target must be a whole multiple
+    of the source (5m from 1m works, 5m from 2m doesn't), and weeks can't
+    make months because a week can straddle a month end.
+    """
+    if _Rank(target) <= _Rank(source):
+        return False
+    if source == "1wk":
+        return False
+    if IsIntraday(source) and IsIntraday(target):
+        return INTRADAY_MINUTES[target] % INTRADAY_MINUTES[source] == 0
+    return True
+
+
+def FormatBarDates(ts: pd.Series, interval: str) -> pd.Series:
+    """
+    Converts timestamps into the ISO strings we store in prices.date.
+
+    - daily and coarser: YYYY-MM-DD
+    - intraday: YYYY-MM-DD HH:MM:SS in exchange-local time (timezone dropped)
+    """
+    ts = pd.to_datetime(ts)
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_localize(None)
+    if IsIntraday(interval):
+        return ts.dt.strftime("%Y-%m-%d %H:%M:%S")
+    return ts.dt.strftime("%Y-%m-%d")
+
+
+def BucketStart(ts: pd.Series, interval: str, session_open: Optional[pd.Series] = None) -> pd.Series:
+    """
+    Maps each timestamp to the start of the interval bucket it belongs to.
+
+    - intraday: whole bar sizes counted from session_open (aligned with ts),
+      so 1h buckets start at 09:30, 10:30, ... like the provider's own 1h bars;
+      without session_open they count from midnight (09:00, 10:00, ...)
+    - 1d: midnight of that day
+    - 1wk: the Monday of that week
+    - 1mo: the 1st of that month
+    """
+    ts = pd.to_datetime(ts)
+    if IsIntraday(interval):
+        anchor = ts.dt.normalize() if session_open is None else pd.to_datetime(session_open)
+        step = pd.Timedelta(minutes=INTRADAY_MINUTES[interval])
+        return anchor + ((ts - anchor) // step) * step
+    if interval == "1d":
+        return ts.dt.normalize()
+    if interval == "1wk":
+        return ts.dt.to_period("W-SUN").dt.start_time
+    if interval == "1mo":
+        return ts.dt.to_period("M").dt.start_time
+    raise ValueError(f"Unknown interval={interval}.")
+
+
+def ResampleBars(bars: pd.DataFrame, target_interval: str) -> pd.DataFrame:
+    """
+    Builds coarser bars out of finer ones for every ticker in one grouped pass.
+
+    Inputs:
+      bars columns: ticker, interval, date, open, high, low, close, adj_close, volume
+      (all rows must share one source interval)
+
+    Outputs:
+      same columns, one row per (ticker, target bucket), interval = target_interval
+      (datetime input dates, e.g. from CompactPrices, stay datetime; strings stay strings)
+    """
+    if bars.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    sources = bars["interval"].unique().tolist() if "interval" in bars.columns else ["1d"]
+    if len(sources) != 1:
+        raise ValueError(f"ResampleBars needs a single source interval, got {sources}.")
+
+    source = sources[0]
+    if not CanResample(source, target_interval):
+        raise ValueError(f"Cannot build {target_interval} bars from {source} bars.")
+
+    # Compact frames (datetime dates, categorical interval) come back compact
+    keep_datetime = pd.api.types.is_datetime64_any_dtype(bars["date"])
+    keep_category = "interval" in bars.columns and isinstance(bars["interval"].dtype, pd.CategoricalDtype)
+
+    df = bars[[c for c in bars.columns if c != "interval"]].copy()
+    df["date"] = pd.to_datetime(df["date"])
+
+    # first/last only mean open/close if bars are in time order
+    df = df.sort_values(["ticker", "date"])
+
+    # Intraday buckets count from each ticker's first bar of the day (the
+    # session open), not from the clock hour
+    session_open = None
+    if IsIntraday(target_interval):
+        day = df["date"].dt.normalize()
+        session_open = df.groupby([df["ticker"], day], observed=True)["date"].transform("min")
+
+    df["bucket"] = BucketStart(df["date"], target_interval, session_open)
+
+    agg = {c: f for c, f in BAR_AGG.items() if c in df.columns}
+    out = df.groupby(["ticker", "bucket"], sort=True, observed=True).agg(agg).reset_index()
+
+    if keep_category:
+        out["interval"] = pd.Categorical([target_interval] * len(out))
+    else:
+        out["interval"] = target_interval
+
+    if keep_datetime:
+        out["date"] = out["bucket"].astype(bars["date"].dtype)
+    else:
+        out["date"] = FormatBarDates(out["bucket"], target_interval)
+
+    return out[[c for c in BAR_COLUMNS if c in out.columns]]
+
+
+def MaterializeResampled(
+    conn: sqlite3.Connection,
+    new_bars: pd.DataFrame,
+    target_interval: str,
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+) -> int:
+    """
+    Refreshes stored target_interval bars after new fine bars were upserted.
+
+    Only buckets touched by new_bars are rebuilt: for each ticker we reload the
+    stored fine bars from the start of the earliest touched bucket, resample
+    them, and upsert the result. Older coarse bars are left alone.
+    Intraday targets reload from the start of the day, so buckets are
+    anchored on the same session open as a full resample, and only buckets
+    from the one holding the earliest new bar onwards are written.
+
+    A rebuilt bar never replaces a better one:
+    - the bucket holding a ticker's oldest stored source bar is skipped unless
+      that bar sits at the bucket start (the history may begin mid-bucket)
+    - stored bars that were fetched at target_interval, or resampled from a
+      coarser source, are kept (a 1mo bar built from 1d beats one built from 1m)
+    Written bars are tagged with derived_from=<source interval>.
+    """
+    if new_bars.empty:
+        return 0
+
+    source = new_bars["interval"].iloc[0] if "interval" in new_bars.columns else "1d"
+
+    # Earliest touched bucket per ticker = where the rebuild has to start
+    reload_from = "1d" if IsIntraday(target_interval) else target_interval
+    starts = (
+        BucketStart(pd.to_datetime(new_bars["date"]), reload_from)
+        .groupby(new_bars["ticker"], observed=True)
+        .min()
+    )
+
+    frames = []
+    first_bars = {}
+    for ticker, start in starts.items():
+        start_str = FormatBarDates(pd.Series([start]), source).iloc[0]
+        rows = FetchPrices(conn, str(ticker), source, start=start_str)
+        if rows:
+            frames.append(pd.DataFrame(rows))
+            first_bars[str(ticker)] = FirstBarDate(conn, str(ticker), source)
+
+    if not frames:
+        return 0
+
+    coarse = ResampleBars(pd.concat(frames, ignore_index=True), target_interval)
+
+    if IsIntraday(target_interval):
+        first_new = pd.to_datetime(new_bars["date"]).groupby(new_bars["ticker"], observed=True).min()
+        bucket = pd.to_datetime(coarse["date"])
+        ticker = coarse["ticker"].astype(str)
+        # A bucket is touched if the next one starts after the first new bar
+        next_start = bucket.groupby(ticker).shift(-1)
+        limit = ticker.map(first_new.rename(index=str))
+        coarse = coarse[next_start.isna() | (next_start > limit)]
+
+    # Skip a bucket the stored source history only partly covers. Calendar
+    # buckets start at midnight, so intraday history counts from its first day.
+    first = pd.to_datetime(coarse["ticker"].astype(str).map(first_bars))
+    if not IsIntraday(target_interval):
+        first = first.dt.normalize()
+    coarse = coarse[pd.to_datetime(coarse["date"]) >= first]
+
+    keep = pd.Series(True, index=coarse.index)
+    for ticker, group in coarse.groupby(coarse["ticker"].astype(str)):
+        stored = FetchBarSources(conn, ticker, target_interval, start=group["date"].min())
+        for idx, date in group["date"].items():
+            if date not in stored:
+                continue
+            derived_from = stored[date]
+            if derived_from is None or _Rank(derived_from) > _Rank(source):
+                keep[idx] = False
+    coarse = coarse[keep].assign(derived_from=source)
+
+    return UpsertPrices(
+        conn, coarse.to_dict(orient="records"), batch_size=batch_size, stats=stats
+    )
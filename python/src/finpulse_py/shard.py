@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import glob  # Finds shard files left by an earlier layout
+import os  # Builds the per-shard file names
+import sqlite3
+import zlib  # crc32 gives a hash that is stable across runs (unlike hash())
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from finpulse_py.db import DEFAULT_BUSY_TIMEOUT_MS, Checkpoint, Connect, InitDb, WriteStats
+
+T = TypeVar("T")
+P = TypeVar("P")
+
+# Tables that exist in every shard (and get a cross-shard view when attached)
+SHARDED_TABLES = ("prices", "analytics", "risk", "corporate_actions")
+
+# How RunOnShards runs shards side by side:
+#   "process" - one process per shard; the per-row Python work (building
+#               tuples, binding, pandas transforms) really runs in parallel
+#   "thread"  - one thread per shard; only SQLite's own work (commits, I/O)
+#               overlaps, everything else shares the GIL
+#   "auto"    - processes when there is more than one CPU, else threads
+SHARD_WORKERS = ("auto", "process", "thread")
+
+# Rows copied per INSERT batch while resharding
+RESHARD_BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class ShardSet:
+    """
+    The SQLite files a sharded database is split across.
+
+    Every table lives in every shard; a ticker's rows all live in the shard
+    picked by ShardIndex, so per-ticker work never crosses shards.
+    """
+    db_path: str
+    paths: List[str]
+    busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS
+
+    @property
+    def count(self) -> int:
+        return len(self.paths)
+
+
+def ShardPaths(db_path: str, n_shards: int) -> List[str]:
+    """
+    Returns the shard file names for db_path, e.g. market.db ->
+    market.shard0.db, market.shard1.db, ...
+
+    One shard is just db_path itself, so the unsharded layout is unchanged.
+
+    The Java API's ShardRouter builds the same names, so keep them in step.
+    """
+    if n_shards < 1:
+        raise ValueError(f"n_shards must be >= 1, got {n_shards}.")
+    if n_shards == 1:
+        return [db_path]
+
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}{ext or '.db'}" for i in range(n_shards)]
+
+
+def ShardIndex(ticker: str, n_shards: int) -> int:
+    """
+    Hash-partitions a ticker onto one of n_shards shards (stable across runs).
+    CRC-32 so the Java API's ShardRouter can route reads the same way.
+    """
+    return zlib.crc32(ticker.encode("utf-8")) % n_shards
+
+
+def _HasRows(path: str) -> bool:
+    """True if the SQLite file at path holds any rows in the sharded tables."""
+    if not os.path.exists(path):
+        return False
+
+    conn = sqlite3.connect(path)
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return any(
+            conn.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() is not None
+            for t in SHARDED_TABLES
+            if t in tables
+        )
+    finally:
+        conn.close()
+
+
+def ExistingLayout(db_path: str) -> List[str]:
+    """
+    Every file currently holding data for db_path: db_path itself (if it has
+    rows) plus any market.shardN.db file, whatever N it was created with.
+    """
+    root, ext = os.path.splitext(db_path)
+    found = sorted(glob.glob(f"{glob.escape(root)}.shard[0-9]*{ext or '.db'}"))
+    return ([db_path] if _HasRows(db_path) else []) + found
+
+
+def CheckShardLayout(db_path: str, n_shards: int) -> None:
+    """
+    Refuses to open a layout that doesn't match n_shards.
+
+    Changing DB_SHARDS re-routes tickers to other files, so their stored
+    history (which resampling and corporate-action rebuilds read back)
+    would be left behind. Run Reshard first.
+    """
+    existing = ExistingLayout(db_path)
+    expected = ShardPaths(db_path, n_shards)
+
+    if existing and sorted(existing) != sorted(expected):
+        raise ValueError(
+            f"DB_SHARDS={n_shards} doesn't match the data on disk ({', '.join(existing)}). "
+            f"Run `python python/src/main.py reshard` to move it into {n_shards} shard(s)."
+        )
+
+
+def OpenShards(
+    db_path: str,
+    n_shards: int,
+    busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+) -> ShardSet:
+    """
+    Creates (if needed) and initializes every shard file, returning the ShardSet.
+
+    Raises ValueError if data on disk was written with a different shard count.
+    """
+    CheckShardLayout(db_path, n_shards)
+
+    shards = ShardSet(db_path=db_path, paths=ShardPaths(db_path, n_shards), busy_timeout_ms=busy_timeout_ms)
+
+    for path in shards.paths:
+        conn = Connect(path, busy_timeout_ms=busy_timeout_ms)
+        try:
+            InitDb(conn)
+        finally:
+            conn.close()
+
+    return shards
+
+
+def PartitionRows(rows: Iterable[Dict[str, Any]], n_shards: int) -> List[List[Dict[str, Any]]]:
+    """Splits rows into one list per shard, routed by their "ticker" value."""
+    parts: List[List[Dict[str, Any]]] = [[] for _ in range(n_shards)]
+    for r in rows:
+        parts[ShardIndex(r["ticker"], n_shards)].append(r)
+    return parts
+
+
+def _RunOne(path: str, busy_timeout_ms: int, fn: Callable[..., T], i: int, part: Any) -> T:
+    """Runs fn on one shard over its own connection (in a worker thread or process)."""
+    conn = Connect(path, busy_timeout_ms=busy_timeout_ms)
+    try:
+        return fn(conn, i, part)
+    finally:
+        conn.close()
+
+
+def _UseProcesses(workers: str, n_jobs: int) -> bool:
+    """Resolves SHARD_WORKERS for n_jobs shards with work to do."""
+    if workers not in SHARD_WORKERS:
+        raise ValueError(f"Unknown shard workers={workers}. Use one of {SHARD_WORKERS}.")
+    if n_jobs < 2 or workers == "thread":
+        return False
+    return workers == "process" or (os.cpu_count() or 1) > 1
+
+
+def RunOnShards(
+    shards: ShardSet,
+    parts: Sequence[Optional[P]],
+    fn: Callable[[sqlite3.Connection, int, P], T],
+    workers: str = "auto",
+) -> List[Optional[T]]:
+    """
+    Runs fn(conn, i, parts[i]) against shard i for every non-empty part, in parallel.
+
+    Each worker opens its own connection and each shard has its own write
+    lock, so shards never wait on each other. Results come back in shard
+    order (None if skipped).
+
+    workers picks threads or processes (see SHARD_WORKERS). With processes,
+    fn must be a module-level function and parts/results must pickle; fn
+    can't update objects in the caller, so return anything you need back.
+    """
+    if len(parts) != shards.count:
+        raise ValueError(f"Expected {shards.count} parts, got {len(parts)}.")
+
+    todo = [i for i, part in enumerate(parts) if part is not None and len(part) > 0]
+    results: List[Optional[T]] = [None] * shards.count
+    if not todo:
+        return results
+
+    executor = ProcessPoolExecutor if _UseProcesses(workers, len(todo)) else ThreadPoolExecutor
+    with executor(max_workers=len(todo)) as pool:
+        futures = {
+            i: pool.submit(_RunOne, shards.paths[i], shards.busy_timeout_ms, fn, i, parts[i])
+            for i in todo
+        }
+        for i, future in futures.items():
+            results[i] = future.result()
+
+    return results
+
+
+def MergeStats(into: WriteStats, parts: Iterable[WriteStats]) -> WriteStats:
+    """Adds per-shard write counters into one WriteStats (max wait is the max over shards)."""
+    for s in parts:
+        into.batches += s.batches
+        into.rows += s.rows
+        into.retries += s.retries
+        into.lock_wait_seconds += s.lock_wait_seconds
+        into.max_lock_wait_seconds = max(into.max_lock_wait_seconds, s.max_lock_wait_seconds)
+        into.wal_bytes_before_checkpoint += s.wal_bytes_before_checkpoint
+        into.wal_bytes_after_checkpoint += s.wal_bytes_after_checkpoint
+    return into
+
+
+def _UpsertPart(
+    conn: sqlite3.Connection,
+    i: int,
+    part: Tuple[Callable[..., int], List[Dict[str, Any]], Optional[int]],
+) -> Tuple[int, WriteStats]:
+    """Shard worker for UpsertSharded: writes one shard's rows, returns (count, stats)."""
+    upsert, rows, batch_size = part
+    stats = WriteStats()
+    return upsert(conn, rows, batch_size=batch_size, stats=stats), stats
+
+
+def UpsertSharded(
+    shards: ShardSet,
+    upsert: Callable[..., int],
+    rows: Iterable[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    stats: Optional[WriteStats] = None,
+    workers: str = "auto",
+) -> int:
+    """
+    Routes rows by ticker and runs upsert (UpsertPrices, UpsertAnalytics or
+    UpsertRisk) on every shard in parallel. Returns the total row count.
+    """
+    parts = [
+        (upsert, part, batch_size) if part else None
+        for part in PartitionRows(rows, shards.count)
+    ]
+
+    results = [r for r in RunOnShards(shards, parts, _UpsertPart, workers=workers) if r is not None]
+
+    if stats is not None:
+        MergeStats(stats, [s for _, s in results])
+
+    return sum(count for count, _ in results)
+
+
+def FanOutQuery(shards: ShardSet, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """
+    Runs the same read query on every shard and concatenates the rows.
+
+    Ordering/limits apply per shard; re-sort the result if you need a global order.
+    """
+    out: List[Dict[str, Any]] = []
+    for path in shards.paths:
+        conn = Connect(path, busy_timeout_ms=shards.busy_timeout_ms)
+        try:
+            out.extend(dict(r) for r in conn.execute(sql, params).fetchall())
+        finally:
+            conn.close()
+    return out
+
+
+def AttachShards(conn: sqlite3.Connection, shards: ShardSet) -> None:
+    """
+    ATTACHes every shard to conn as shard0, shard1, ... and creates temp views
+    all_prices, all_analytics, all_risk, all_corporate_actions that UNION ALL
+    the shards together.
+
+    SQLite caps attached databases (10 by default), so this suits small shard
+    counts; use FanOutQuery beyond that.
+    """
+    for i, path in enumerate(shards.paths):
+        conn.execute(f"ATTACH DATABASE ? AS shard{i};", (path,))
+
+    for table in SHARDED_TABLES:
+        union = " UNION ALL ".join(f"SELECT * FROM shard{i}.{table}" for i in range(shards.count))
+        conn.execute(f"DROP VIEW IF EXISTS temp.all_{table};")
+        conn.execute(f"CREATE TEMP VIEW all_{table} AS {union};")
+
+
+def _CopyTable(src: sqlite3.Connection, targets: List[sqlite3.Connection], table: str) -> int:
+    """Copies every row of table from src into the target picked by its ticker."""
+    cur = src.execute(f"SELECT * FROM {table}")
+    cols = [d[0] for d in cur.description]
+    ticker_at = cols.index("ticker")
+    sql = f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+    copied = 0
+    while True:
+        rows = cur.fetchmany(RESHARD_BATCH_SIZE)
+        if not rows:
+            return copied
+
+        parts: List[List[Tuple[Any, ...]]] = [[] for _ in targets]
+        for r in rows:
+            parts[ShardIndex(r[ticker_at], len(targets))].append(tuple(r))
+        for conn, part in zip(targets, parts):
+            if part:
+                conn.executemany(sql, part)
+        copied += len(rows)
+
+
+def _RemoveDb(path: str) -> None:
+    """Deletes a SQLite file and its WAL/shared-memory side files."""
+    for p in (path, f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def Reshard(db_path: str, n_shards: int, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS) -> Dict[str, Any]:
+    """
+    Moves whatever is on disk for db_path (the single file and/or shard files
+    from any earlier DB_SHARDS) into the n_shards layout.
+
+    The new files are built next to the old ones and only swapped in once
+    every row is copied, so a failure leaves the old layout untouched.
+    Nothing else may write to the database while this runs.
+    """
+    sources = ExistingLayout(db_path)
+    targets = ShardPaths(db_path, n_shards)
+    building = [f"{p}.reshard" for p in targets]
+
+    for p in building:
+        _RemoveDb(p)
+
+    out = [Connect(p, busy_timeout_ms=busy_timeout_ms) for p in building]
+    copied = 0
+    try:
+        for conn in out:
+            InitDb(conn)
+
+        for path in sources:
+            src = Connect(path, busy_timeout_ms=busy_timeout_ms)
+            try:
+                # Brings shards from older versions up to the current schema
+                InitDb(src)
+                for table in SHARDED_TABLES:
+                    copied += _CopyTable(src, out, table)
+            finally:
+                src.close()
+
+        for conn in out:
+            conn.commit()
+            Checkpoint(conn, "TRUNCATE")
+    finally:
+        for conn in out:
+            conn.close()
+
+    # Swap in the new layout, then drop old files it doesn't reuse
+    for new, path in zip(building, targets):
+        _RemoveDb(path)
+        os.replace(new, path)
+        _RemoveDb(new)
+
+    for path in sources:
+        if path not in targets:
+            _RemoveDb(path)
+
+    return {"sources": sources, "targets": targets, "rows_copied": copied}
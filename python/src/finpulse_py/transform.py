@@ -5,21 +5,43 @@ from typing import Dict, Any
 import numpy as np
 import pandas as pd
 
+from finpulse_py.compact import IsCompact
 
-def ComputeAnalytics(prices: pd.DataFrame) -> pd.DataFrame:
+
+def _PriceSeries(df: pd.DataFrame, price_col: str) -> pd.Series:
+    """
+    The price column analytics run on, falling back to raw close wherever it's missing
+    (e.g. adj_close for a bar the provider didn't adjust).
+    """
+    if price_col == "close" or price_col not in df.columns:
+        return df["close"]
+    return df[price_col].fillna(df["close"])
+
+
+def _UsedColumns(prices: pd.DataFrame, price_col: str) -> list:
+    """The only columns the transforms read (price_col may be close itself)."""
+    wanted = dict.fromkeys(["ticker", "date", "close", price_col])
+    return [c for c in wanted if c in prices.columns]
+
+
+def ComputeAnalytics(prices: pd.DataFrame, price_col: str = "close") -> pd.DataFrame:
     """
     Takes prices data and creates time-series analytics per ticker.
 
     Inputs:
       prices columns: ticker, date, close (plus others if available)
+      price_col: which price to use; pass "adj_close" so splits/dividends
+        don't show up as fake returns
 
     Outputs:
       analytics columns: ticker, date, daily_return, ma20, ma50, vol20
+      (compact input keeps categorical tickers and datetime dates; see compact.py)
     """
     if prices.empty:
         return pd.DataFrame()
 
-    df = prices.copy()
+    # Copy only what we use, so OHLC/volume columns aren't duplicated
+    df = prices[_UsedColumns(prices, price_col)].copy()
 
     # Convert date string -> datetime so sorting and rolling windows work correctly
     df["date"] = pd.to_datetime(df["date"])
@@ -27,26 +49,35 @@ def ComputeAnalytics(prices: pd.DataFrame) -> pd.DataFrame:
     # Sort ensures rolling windows are computed in the correct time order
     df = df.sort_values(["ticker", "date"])
 
+    df["px"] = _PriceSeries(df, price_col)
+
+    # observed=True: with categorical tickers, only group tickers actually present
+    by_ticker = df.groupby("ticker", observed=True)
+
     # pct_change calculates (today_close / yesterday_close - 1)
-    df["daily_return"] = df.groupby("ticker")["close"].pct_change()
+    df["daily_return"] = by_ticker["px"].pct_change()
 
     # Rolling moving averages (20-day and 50-day)
-    df["ma20"] = df.groupby("ticker")["close"].transform(lambda s: s.rolling(20).mean())
-    df["ma50"] = df.groupby("ticker")["close"].transform(lambda s: s.rolling(50).mean())
+    df["ma20"] = by_ticker["px"].transform(lambda s: s.rolling(20).mean())
+    df["ma50"] = by_ticker["px"].transform(lambda s: s.rolling(50).mean())
 
     # Rolling volatility: standard deviation of daily returns over 20 days
-    df["vol20"] = df.groupby("ticker")["daily_return"].transform(lambda s: s.rolling(20).std())
+    df["vol20"] = df.groupby("ticker", observed=True)["daily_return"].transform(
+        lambda s: s.rolling(20).std()
+    )
 
     # Select final columns
-    out = df[["ticker", "date", "daily_return", "ma20", "ma50", "vol20"]].copy()
+    out = df[["ticker", "date", "daily_return", "ma20", "ma50", "vol20"]]
 
-    # Store date back to ISO string for SQLite
-    out["date"] = out["date"].dt.date.astype(str)
+    # Store date back to ISO string for SQLite (compact frames convert at the DB boundary)
+    if not IsCompact(out):
+        out = out.copy()
+        out["date"] = out["date"].dt.date.astype(str)
 
     return out
 
 
-def ComputeRisk(prices: pd.DataFrame) -> pd.DataFrame:
+def ComputeRisk(prices: pd.DataFrame, price_col: str = "close") -> pd.DataFrame:
     """
     Compute per-ticker 'quant-lite' risk metrics as-of the latest date.
 
@@ -55,27 +86,26 @@ def ComputeRisk(prices: pd.DataFrame) -> pd.DataFrame:
     - Sharpe ratio (annualized): mean(ret)/std(ret) * sqrt(252)
     - Max Drawdown: worst peak-to-trough decline in the price curve
 
+    price_col picks the price series (see ComputeAnalytics).
+
     Output columns:
       ticker, as_of_date, var_95_1d, sharpe, max_drawdown
     """
     if prices.empty:
         return pd.DataFrame()
 
-    df = prices.copy()
+    # Copy only what we use, so OHLC/volume columns aren't duplicated
+    df = prices[_UsedColumns(prices, price_col)].copy()
     df["date"] = pd.to_datetime(df["date"])
     df = df.sort_values(["ticker", "date"])
+    df["px"] = _PriceSeries(df, price_col)
 
     results = []
 
     # Process each ticker separately to avoid mixing timeseries
-    for ticker, g in df.groupby("ticker"):
-        g = g.copy()
-
-        # Compute daily returns
-        g["ret"] = g["close"].pct_change()
-
-        # Drop NaNs caused by pct_change on first row
-        rets = g["ret"].dropna()
+    for ticker, g in df.groupby("ticker", observed=True):
+        # Compute daily returns, dropping the NaN pct_change leaves on the first row
+        rets = g["px"].pct_change().dropna()
         if len(rets) < 30:
             # Not enough data: skip risk metrics (or you could compute anyway)
             continue
@@ -93,8 +123,8 @@ def ComputeRisk(prices: pd.DataFrame) -> pd.DataFrame:
         # Max drawdown:
         # 1) compute running max of close prices
         # 2) compute drawdown = (close / running_max - 1)
-        running_max = g["close"].cummax()
-        drawdown = (g["close"] / running_max) - 1.0
+        running_max = g["px"].cummax()
+        drawdown = (g["px"] / running_max) - 1.0
         max_drawdown = float(drawdown.min())  # most negative value
 
         # as_of_date should be the latest date in the series
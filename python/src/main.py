@@ -5,7 +5,9 @@ from typing import List
 
 # Import Settings loader + pipeline runner
 from finpulse_py.config import GetSettings
-from finpulse_py.pipeline import RunPipeline
+from finpulse_py.pipeline import RunPipeline, ApplyCorporateActions
+from finpulse_py.ingest import ReadCorporateActionsFile
+from finpulse_py.shard import Reshard
 
 
 def PrintUsage() -> None:
@@ -15,6 +17,8 @@ def PrintUsage() -> None:
     """
     print("Usage:")
     print("  python python/src/main.py run       # runs the pipeline (default)")
+    print("  python python/src/main.py actions <file.csv>  # applies new splits/dividends")
+    print("  python python/src/main.py reshard   # moves stored data into DB_SHARDS shard(s)")
     print("  python python/src/main.py help      # prints this message")
 
 
@@ -33,6 +37,36 @@ def Main(argv: List[str]) -> int:
         PrintUsage()
         return 0
 
+    if command == "actions":
+        if len(argv) < 3:
+            print("Missing corporate actions file.")
+            PrintUsage()
+            return 2
+
+        # Only tickers with new/changed actions get their history rewritten
+        summary = ApplyCorporateActions(GetSettings(), ReadCorporateActionsFile(argv[2]))
+
+        print("\n=== FinPulse Corporate Actions ===")
+        print(f"Tickers rebuilt:   {summary.get('tickers_rebuilt')}")
+        print(f"Prices upserted:   {summary.get('prices_rows_upserted')}")
+        print(f"Analytics upserted:{summary.get('analytics_rows_upserted')}")
+        print(f"Risk upserted:     {summary.get('risk_rows_upserted')}")
+        print(f"Message:           {summary.get('message')}")
+        print("==================================\n")
+        return 0
+
+    if command == "reshard":
+        # Needed after changing DB_SHARDS; the pipeline refuses to run until then
+        settings = GetSettings()
+        result = Reshard(settings.db_path, settings.db_shards, settings.busy_timeout_ms)
+
+        print("\n=== FinPulse Reshard ===")
+        print(f"From:        {result['sources']}")
+        print(f"To:          {result['targets']}")
+        print(f"Rows copied: {result['rows_copied']}")
+        print("========================\n")
+        return 0
+
     if command != "run":
         print(f"Unknown command: {command}")
         PrintUsage()
@@ -46,12 +80,18 @@ def Main(argv: List[str]) -> int:
 
     # Print a human-readable summary
     print("\n=== FinPulse Pipeline Summary ===")
-    print(f"DB Path: {summary.get('db_path')}")
+    print(f"DB Path: {summary.get('db_path')} ({summary.get('db_shards')} shard(s))")
     print(f"Tickers requested: {summary.get('tickers_requested')}")
     print(f"Tickers loaded:    {summary.get('tickers_loaded')}")
     print(f"Prices upserted:   {summary.get('prices_rows_upserted')}")
+    print(f"Resampled upserted:{summary.get('resampled_rows_upserted')}")
     print(f"Analytics upserted:{summary.get('analytics_rows_upserted')}")
     print(f"Risk upserted:     {summary.get('risk_rows_upserted')}")
+    print(f"Tickers rebuilt:   {summary.get('tickers_rebuilt')}")
+    print(f"Write batches:     {summary.get('write_batches')}")
+    print(f"Write retries:     {summary.get('write_retries')}")
+    print(f"Lock wait (s):     {summary.get('lock_wait_seconds')}")
+    print(f"WAL bytes:         {summary.get('wal_bytes_before_checkpoint')} -> {summary.get('wal_bytes_after_checkpoint')}")
     print(f"Message:           {summary.get('message')}")
     print("=================================\n")
 
@@ -0,0 +1,246 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import finpulse_py.pipeline as pipeline
+from finpulse_py.config import Settings
+from finpulse_py.db import Connect, FetchPrices, InitDb, UpsertCorporateActions, UpsertPrices
+from finpulse_py.adjust import ActionsToApply, AdjustmentFactors, ApplyAdjustments
+from finpulse_py.transform import ComputeAnalytics, ComputeRisk
+
+
+def MakeBars(ticker, closes, start="2024-01-01"):
+    dates = pd.date_range(start, periods=len(closes), freq="D")
+    return pd.DataFrame(
+        {
+            "ticker": ticker,
+            "interval": "1d",
+            "date": dates.strftime("%Y-%m-%d"),
+            "close": np.asarray(closes, dtype=float),
+            "adj_close": np.asarray(closes, dtype=float),
+        }
+    )
+
+
+def TestSplitFactorOnlyAppliesBeforeExDate():
+    bars = MakeBars("AAPL", [400.0, 404.0, 101.0, 102.0])
+    actions = pd.DataFrame(
+        {"ticker": ["AAPL"], "date": ["2024-01-03"], "action": ["split"], "value": [4.0]}
+    )
+
+    factor = AdjustmentFactors(bars, actions)
+
+    assert factor.tolist() == [0.25, 0.25, 1.0, 1.0]
+
+
+def TestDividendAndWeekendExDate():
+    # Ex-date on a day without a bar applies from the next bar
+    bars = MakeBars("MSFT", [100.0, 50.0]).assign(date=["2024-01-05", "2024-01-08"])
+    actions = pd.DataFrame(
+        {"ticker": ["MSFT"], "date": ["2024-01-06"], "action": ["dividend"], "value": [2.0]}
+    )
+
+    factor = AdjustmentFactors(bars, actions)
+
+    assert abs(factor.iloc[0] - 0.98) < 1e-12
+    assert factor.iloc[1] == 1.0
+
+
+def TestApplyAdjustmentsLeavesTickersWithoutActionsAlone():
+    bars = pd.concat(
+        [MakeBars("AAPL", [400.0, 100.0]), MakeBars("GS", [10.0, 11.0]).assign(adj_close=[9.0, 10.0])],
+        ignore_index=True,
+    )
+    actions = pd.DataFrame(
+        {"ticker": ["AAPL"], "date": ["2024-01-02"], "action": ["split"], "value": [4.0]}
+    )
+
+    out = ApplyAdjustments(bars, actions)
+
+    assert out["adj_close"].tolist() == [100.0, 100.0, 9.0, 10.0]
+
+
+def TestSplitNoLongerLooksLikeACrash():
+    closes = np.r_[np.linspace(400, 420, 40), np.linspace(105, 110, 40)]
+    bars = MakeBars("AAPL", closes)
+    actions = pd.DataFrame(
+        {"ticker": ["AAPL"], "date": [bars["date"].iloc[40]], "action": ["split"], "value": [4.0]}
+    )
+
+    adjusted = ApplyAdjustments(bars, actions)
+
+    raw = ComputeAnalytics(adjusted)
+    adj = ComputeAnalytics(adjusted, price_col="adj_close")
+    assert raw["daily_return"].min() < -0.7
+    assert adj["daily_return"].min() > -0.05
+
+    risk = ComputeRisk(adjusted, price_col="adj_close")
+    assert risk.iloc[0]["max_drawdown"] > -0.05
+
+
+def TestFileDividendLayersOnProviderAdjustment():
+    # The provider already adjusted for dividends we don't have in the file
+    bars = MakeBars("MSFT", [100.0, 100.0, 100.0]).assign(adj_close=[97.0, 98.0, 99.0])
+    actions = pd.DataFrame(
+        {"ticker": ["MSFT"], "date": ["2024-01-03"], "action": ["dividend"], "value": [1.0], "source": ["file"]}
+    )
+
+    out = ApplyAdjustments(bars, actions)
+
+    assert np.allclose(out["adj_close"], [97.0 * 0.99, 98.0 * 0.99, 99.0])
+
+
+def TestProviderActionsRebuildFromClose():
+    bars = MakeBars("MSFT", [100.0, 100.0, 100.0]).assign(adj_close=[1.0, 1.0, 1.0])
+    actions = pd.DataFrame(
+        {"ticker": ["MSFT"], "date": ["2024-01-03"], "action": ["dividend"], "value": [1.0], "source": ["provider"]}
+    )
+
+    out = ApplyAdjustments(bars, actions)
+
+    assert np.allclose(out["adj_close"], [99.0, 99.0, 100.0])
+
+
+def TestActionsToApplyReportsOnlyChangedTickers():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = Connect(os.path.join(tmpdir, "test.db"))
+        try:
+            InitDb(conn)
+            first = pd.DataFrame(
+                {
+                    "ticker": ["AAPL", "MSFT"],
+                    "date": ["2024-01-02", "2024-01-03"],
+                    "action": ["split", "dividend"],
+                    "value": [4.0, 0.75],
+                    "source": ["file", "file"],
+                }
+            )
+            changed, tickers = ActionsToApply(conn, first)
+            assert tickers == ["AAPL", "MSFT"]
+
+            # Nothing is stored until the history is rewritten
+            assert ActionsToApply(conn, first)[1] == ["AAPL", "MSFT"]
+
+            UpsertCorporateActions(conn, changed.to_dict(orient="records"))
+
+            # Same actions again: nothing to rebuild
+            assert ActionsToApply(conn, first)[1] == []
+
+            # Corrected MSFT dividend: only MSFT is stale
+            fixed = first.assign(value=[4.0, 0.80])
+            assert ActionsToApply(conn, fixed)[1] == ["MSFT"]
+
+            # Stored but never finished applying: stale too
+            UpsertCorporateActions(conn, first[first["ticker"] == "AAPL"].to_dict(orient="records"), applied=False)
+            assert ActionsToApply(conn, first)[1] == ["AAPL"]
+        finally:
+            conn.close()
+
+
+def _FakeFetch(tickers, period="2y", interval="1d", compact=False):
+    closes = [100.0, 100.0, 100.0, 100.0]
+    return pd.concat([MakeBars(t, closes) for t in tickers], ignore_index=True).assign(volume=10)
+
+
+@pytest.mark.parametrize("failing", ["RewriteAdjustedHistory", "UpsertAnalytics"])
+def TestFailedRebuildIsRetried(monkeypatch, failing):
+    monkeypatch.setattr(pipeline, "FetchOhlcv", _FakeFetch)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings = Settings(
+            data_provider="yfinance",
+            db_path=os.path.join(tmpdir, "test.db"),
+            tickers=["MSFT"],
+        )
+        pipeline.RunPipeline(settings)
+
+        actions = pd.DataFrame(
+            {"ticker": ["MSFT"], "date": ["2024-01-03"], "action": ["dividend"], "value": [1.0], "source": ["file"]}
+        )
+
+        # One step of the rebuild fails once
+        real = getattr(pipeline, failing)
+        calls = []
+
+        def FailOnce(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return real(*args, **kwargs)
+
+        monkeypatch.setattr(pipeline, failing, FailOnce)
+
+        with pytest.raises(RuntimeError):
+            pipeline.ApplyCorporateActions(settings, actions)
+
+        summary = pipeline.ApplyCorporateActions(settings, actions)
+        assert summary["tickers_rebuilt"] == 1
+
+        # Once applied, sending the same action again rebuilds nothing
+        assert pipeline.ApplyCorporateActions(settings, actions)["tickers_rebuilt"] == 0
+
+        conn = Connect(settings.db_path)
+        try:
+            bars = {r["date"]: r for r in FetchPrices(conn, "MSFT", "1d")}
+        finally:
+            conn.close()
+
+        assert bars["2024-01-01"]["adj_close"] == pytest.approx(99.0)
+        assert bars["2024-01-03"]["adj_close"] == pytest.approx(100.0)
+
+
+def TestRebuildKeepsTheRiskWindow(monkeypatch):
+    def RisingFetch(tickers, period="2y", interval="1d", compact=False):
+        closes = 100.0 + np.arange(60)
+        return pd.concat([MakeBars(t, closes) for t in tickers], ignore_index=True).assign(volume=10)
+
+    monkeypatch.setattr(pipeline, "FetchOhlcv", RisingFetch)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings = Settings(
+            data_provider="yfinance",
+            db_path=os.path.join(tmpdir, "test.db"),
+            tickers=["MSFT"],
+            period="3mo",
+        )
+
+        # Older history, well outside the 3mo window, with a crash in it
+        conn = Connect(settings.db_path)
+        InitDb(conn)
+        crash = MakeBars("MSFT", np.linspace(300.0, 100.0, 40), start="2023-06-01")
+        UpsertPrices(conn, crash.to_dict(orient="records"))
+        conn.close()
+
+        def StoredRisk():
+            conn = Connect(settings.db_path)
+            try:
+                return dict(conn.execute("SELECT * FROM risk WHERE ticker = 'MSFT'").fetchone())
+            finally:
+                conn.close()
+
+        pipeline.RunPipeline(settings)
+        before = StoredRisk()
+
+        actions = pd.DataFrame(
+            {"ticker": ["MSFT"], "date": ["2024-02-01"], "action": ["dividend"], "value": [0.01], "source": ["file"]}
+        )
+        assert pipeline.ApplyCorporateActions(settings, actions)["tickers_rebuilt"] == 1
+        after = StoredRisk()
+
+        assert after["as_of_date"] == before["as_of_date"]
+        assert before["max_drawdown"] == 0.0
+        assert after["max_drawdown"] == 0.0
+
+
+def TestFileSplitsRejectedForYahoo():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings = Settings(data_provider="yfinance", db_path=os.path.join(tmpdir, "test.db"), tickers=["AAPL"])
+        actions = pd.DataFrame(
+            {"ticker": ["AAPL"], "date": ["2020-08-31"], "action": ["split"], "value": [4.0], "source": ["file"]}
+        )
+
+        with pytest.raises(ValueError, match="split-adjusted"):
+            pipeline.ApplyCorporateActions(settings, actions)
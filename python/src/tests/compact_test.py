@@ -0,0 +1,130 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import finpulse_py.pipeline as pipeline
+from finpulse_py.config import Settings
+from finpulse_py.db import Connect, FetchPrices
+from finpulse_py.compact import CompactPrices, FrameMemoryBytes, ToDbRecords
+from finpulse_py.resample import ResampleBars
+from finpulse_py.transform import ComputeAnalytics, ComputeRisk
+
+
+def MakePrices(tickers, n_days):
+    dates = pd.bdate_range("2024-01-01", periods=n_days).strftime("%Y-%m-%d")
+    frames = []
+    for i, t in enumerate(tickers):
+        close = np.round(100.0 + i * 10 + np.sin(np.arange(n_days) / 5.0) * 5, 2)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "ticker": t,
+                    "interval": "1d",
+                    "date": dates,
+                    "open": close,
+                    "high": close + 1.0,
+                    "low": close - 1.0,
+                    "close": close,
+                    "adj_close": close,
+                    "volume": np.full(n_days, 1_000_000.0),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def TestCompactPricesDtypesAndMemory():
+    prices = MakePrices(["AAPL", "MSFT", "GS"], 100)
+    compact = CompactPrices(prices)
+
+    assert isinstance(compact["ticker"].dtype, pd.CategoricalDtype)
+    assert compact["date"].dtype == "datetime64[s]"
+    assert compact["close"].dtype == np.float32
+    assert compact["volume"].dtype == "UInt32"
+    assert FrameMemoryBytes(compact) < FrameMemoryBytes(prices) / 2
+
+
+def TestPricesTooLargeForFloat32StayFloat64():
+    prices = MakePrices(["BRKA"], 5)
+    prices["close"] = 612345.67
+
+    assert CompactPrices(prices)["close"].dtype == np.float64
+
+
+def TestToDbRecordsRoundTripsExactly():
+    prices = MakePrices(["AAPL"], 3)
+
+    rows = ToDbRecords(CompactPrices(prices), "1d")
+
+    assert rows == prices.to_dict(orient="records")
+
+
+def TestToDbRecordsWithoutStringsKeepsShortestDecimals():
+    prices = MakePrices(["AAPL"], 4)
+    prices["close"] = [12345.67, 0.1234, 98765.43, np.nan]
+    prices["volume"] = [1.0, np.nan, 3.0, 4.0]
+
+    compact = CompactPrices(prices)
+    assert compact["close"].dtype == np.float32
+
+    rows = ToDbRecords(compact, "1d")
+
+    assert [r["close"] for r in rows[:3]] == [12345.67, 0.1234, 98765.43]
+    assert np.isnan(rows[3]["close"])
+    assert [r["volume"] for r in rows] == [1, None, 3, 4]
+
+
+def TestTransformsOnCompactMatchFloat64():
+    prices = MakePrices(["AAPL", "MSFT"], 120)
+    compact = CompactPrices(prices)
+
+    wide = ComputeAnalytics(prices, price_col="adj_close")
+    small = ComputeAnalytics(compact, price_col="adj_close")
+
+    assert len(small) == len(wide)
+    assert np.allclose(small["ma20"], wide["ma20"], rtol=1e-6, equal_nan=True)
+    assert np.allclose(small["vol20"], wide["vol20"], rtol=1e-4, equal_nan=True)
+
+    risk_wide = ComputeRisk(prices, price_col="adj_close")
+    risk_small = ComputeRisk(compact, price_col="adj_close")
+    assert np.allclose(risk_small["max_drawdown"], risk_wide["max_drawdown"], rtol=1e-5)
+
+    weekly = ResampleBars(compact, "1wk")
+    assert len(weekly) == len(ResampleBars(prices, "1wk"))
+
+    # Stays compact: no string dates or intervals coming back out
+    assert weekly["date"].dtype == "datetime64[s]"
+    assert isinstance(weekly["interval"].dtype, pd.CategoricalDtype)
+    assert ToDbRecords(weekly, "1wk") == ToDbRecords(ResampleBars(prices, "1wk"), "1wk")
+
+
+def TestCompactModeStoresTheSameRows(monkeypatch):
+    prices = MakePrices(["AAPL", "MSFT"], 60)
+    prices.loc[3, "volume"] = np.nan
+
+    def FakeFetch(tickers, period="2y", interval="1d", compact=False):
+        return CompactPrices(prices) if compact else prices
+
+    monkeypatch.setattr(pipeline, "FetchOhlcv", FakeFetch)
+
+    stored = {}
+    for compact in (False, True):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings = Settings(
+                data_provider="yfinance",
+                db_path=os.path.join(tmpdir, "test.db"),
+                tickers=["AAPL", "MSFT"],
+                compact_dtypes=compact,
+            )
+            pipeline.RunPipeline(settings)
+
+            conn = Connect(settings.db_path)
+            try:
+                stored[compact] = [FetchPrices(conn, t, i) for t in ("AAPL", "MSFT") for i in ("1d", "1wk", "1mo")]
+            finally:
+                conn.close()
+
+    assert stored[True] == stored[False]
+    assert stored[True][0][3]["volume"] is None
@@ -2,7 +2,7 @@ import os
 import sqlite3
 import tempfile
 
-from finpulse_py.db import Connect, InitDb, UpsertPrices
+from finpulse_py.db import Connect, InitDb, RewriteAdjustedHistory, UpsertPrices, WriteStats
 
 
 def TestInitDbCreatesTables():
@@ -63,4 +63,69 @@ def TestUpsertPricesIsIdempotent():
             assert result is not None
             assert result["close"] == 200.0
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+
+def TestInitDbMigratesPricesWithoutInterval():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+
+        # Old layout: one row per (ticker, date), no interval column
+        old = sqlite3.connect(db_path)
+        old.execute(
+            "CREATE TABLE prices (ticker TEXT NOT NULL, date TEXT NOT NULL, open REAL, high REAL, "
+            "low REAL, close REAL, adj_close REAL, volume INTEGER, PRIMARY KEY (ticker, date));"
+        )
+        old.execute("INSERT INTO prices (ticker, date, close) VALUES ('AAPL', '2024-01-01', 1.0);")
+        old.commit()
+        old.close()
+
+        conn = Connect(db_path)
+        try:
+            InitDb(conn)
+
+            result = conn.execute(
+                "SELECT interval, close FROM prices WHERE ticker=? AND date=?",
+                ("AAPL", "2024-01-01"),
+            ).fetchone()
+
+            assert result["interval"] == "1d"
+            assert result["close"] == 1.0
+        finally:
+            conn.close()
+
+
+def TestRewriteAdjustedHistoryBatchesWholeTickers():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = Connect(os.path.join(tmpdir, "test.db"))
+        try:
+            InitDb(conn)
+
+            bars = [
+                {"ticker": t, "date": f"2024-01-0{d}", "close": 1.0}
+                for t in ("AAPL", "MSFT", "NVDA")
+                for d in range(1, 5)
+            ]
+            actions = [
+                {"ticker": t, "date": "2024-01-03", "action": "dividend", "value": 0.1, "source": "file"}
+                for t in ("AAPL", "NVDA")
+            ]
+
+            # 4 bars per ticker, at most 5 per transaction: one ticker each
+            stats = WriteStats()
+            RewriteAdjustedHistory(conn, bars, actions, batch_size=5, stats=stats)
+            assert stats.batches == 3
+
+            # A ticker bigger than the batch still goes in whole
+            stats = WriteStats()
+            RewriteAdjustedHistory(conn, bars, actions, batch_size=2, stats=stats)
+            assert stats.batches == 3
+
+            stats = WriteStats()
+            RewriteAdjustedHistory(conn, bars, actions, batch_size=8, stats=stats)
+            assert stats.batches == 2
+
+            assert conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == 12
+            assert conn.execute("SELECT COUNT(*) FROM corporate_actions WHERE applied = 0").fetchone()[0] == 2
+        finally:
+            conn.close()
@@ -0,0 +1,273 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import finpulse_py.pipeline as pipeline
+from finpulse_py.config import Settings
+from finpulse_py.db import Connect, InitDb, UpsertAnalytics, UpsertPrices, FetchPrices
+from finpulse_py.ingest import ResolvePeriod
+from finpulse_py.resample import CanResample, ResampleBars, MaterializeResampled
+
+
+def MakeMinuteBars(ticker, start, n):
+    ts = pd.date_range(start, periods=n, freq="1min")
+    close = 100.0 + np.arange(n, dtype=float)
+    return pd.DataFrame(
+        {
+            "ticker": ticker,
+            "interval": "1m",
+            "date": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "open": close - 0.5,
+            "high": close + 1.0,
+            "low": close - 1.0,
+            "close": close,
+            "adj_close": close,
+            "volume": np.full(n, 10, dtype=np.int64),
+        }
+    )
+
+
+def TestCanResampleOnlyCoarserMultiples():
+    assert CanResample("1m", "5m")
+    assert CanResample("1m", "1h")
+    assert CanResample("1d", "1wk")
+    assert CanResample("1h", "1mo")
+    assert not CanResample("5m", "1m")
+    assert not CanResample("2m", "5m")
+    assert not CanResample("1d", "1d")
+    assert not CanResample("1wk", "1mo")
+
+
+def TestResampleMinuteBarsToFiveMinutes():
+    bars = pd.concat(
+        [MakeMinuteBars("AAPL", "2024-01-02 09:30", 10), MakeMinuteBars("MSFT", "2024-01-02 09:30", 10)],
+        ignore_index=True,
+    )
+
+    out = ResampleBars(bars, "5m")
+
+    assert len(out) == 4
+    assert set(out["interval"]) == {"5m"}
+
+    first = out[(out["ticker"] == "AAPL") & (out["date"] == "2024-01-02 09:30:00")].iloc[0]
+    assert first["open"] == 99.5
+    assert first["high"] == 105.0
+    assert first["low"] == 99.0
+    assert first["close"] == 104.0
+    assert first["volume"] == 50
+
+
+def TestHourBarsStartAtTheSessionOpen():
+    bars = MakeMinuteBars("AAPL", "2024-01-02 09:30", 150)
+
+    out = ResampleBars(bars, "1h")
+
+    # Same bucket edges as the provider's own 1h bars
+    assert out["date"].tolist() == ["2024-01-02 09:30:00", "2024-01-02 10:30:00", "2024-01-02 11:30:00"]
+    assert out["volume"].tolist() == [600, 600, 300]
+
+
+def TestResampleDailyToWeeklyAndMonthly():
+    dates = pd.bdate_range("2024-01-01", "2024-02-29")
+    bars = pd.DataFrame(
+        {
+            "ticker": "AAPL",
+            "interval": "1d",
+            "date": dates.strftime("%Y-%m-%d"),
+            "open": 1.0,
+            "high": np.arange(len(dates), dtype=float),
+            "low": 0.0,
+            "close": np.arange(len(dates), dtype=float),
+            "adj_close": np.arange(len(dates), dtype=float),
+            "volume": 1,
+        }
+    )
+
+    weekly = ResampleBars(bars, "1wk")
+    monthly = ResampleBars(bars, "1mo")
+
+    # Weeks are labelled by their Monday
+    assert weekly.iloc[0]["date"] == "2024-01-01"
+    assert weekly.iloc[0]["volume"] == 5
+
+    assert monthly["date"].tolist() == ["2024-01-01", "2024-02-01"]
+    jan = (dates.month == 1).sum()
+    assert monthly.iloc[0]["close"] == jan - 1
+    assert monthly.iloc[1]["volume"] == len(dates) - jan
+
+
+def TestIntradayAndDailyBarsDoNotCollide():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = Connect(os.path.join(tmpdir, "test.db"))
+        try:
+            InitDb(conn)
+            row = {"ticker": "AAPL", "date": "2024-01-02", "close": 1.0}
+            UpsertPrices(conn, [dict(row, interval="1d"), dict(row, interval="1wk")])
+
+            assert len(FetchPrices(conn, "AAPL", "1d")) == 1
+            assert len(FetchPrices(conn, "AAPL", "1wk")) == 1
+        finally:
+            conn.close()
+
+
+def TestMaterializeOnlyRebuildsTouchedBuckets():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = Connect(os.path.join(tmpdir, "test.db"))
+        try:
+            InitDb(conn)
+
+            first = MakeMinuteBars("AAPL", "2024-01-02 09:30", 10)
+            UpsertPrices(conn, first.to_dict(orient="records"))
+            MaterializeResampled(conn, first, "5m")
+
+            # Tamper with the first 5m bar: it must survive the next refresh
+            conn.execute(
+                "UPDATE prices SET volume = -1 WHERE interval = '5m' AND date = '2024-01-02 09:30:00'"
+            )
+            conn.commit()
+
+            # Three new minutes complete the 09:40 bucket
+            more = MakeMinuteBars("AAPL", "2024-01-02 09:40", 3)
+            UpsertPrices(conn, more.to_dict(orient="records"))
+            written = MaterializeResampled(conn, more, "5m")
+
+            bars = {r["date"]: r for r in FetchPrices(conn, "AAPL", "5m")}
+
+            assert written == 1
+            assert bars["2024-01-02 09:30:00"]["volume"] == -1
+            assert bars["2024-01-02 09:40:00"]["volume"] == 30
+        finally:
+            conn.close()
+
+
+def TestMaterializeKeepsFetchedBars():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        conn = Connect(os.path.join(tmpdir, "test.db"))
+        try:
+            InitDb(conn)
+
+            # A 5m bar the provider gave us directly
+            fetched = {"ticker": "AAPL", "interval": "5m", "date": "2024-01-02 09:30:00", "close": 1.0, "volume": 7}
+            UpsertPrices(conn, [fetched])
+
+            minutes = MakeMinuteBars("AAPL", "2024-01-02 09:30", 10)
+            UpsertPrices(conn, minutes.to_dict(orient="records"))
+            written = MaterializeResampled(conn, minutes, "5m")
+
+            bars = {r["date"]: r for r in FetchPrices(conn, "AAPL", "5m")}
+
+            assert written == 1
+            assert bars["2024-01-02 09:30:00"]["volume"] == 7
+            assert bars["2024-01-02 09:35:00"]["volume"] == 50
+        finally:
+            conn.close()
+
+
+def TestIntradayRunLeavesDailyBuiltBarsAlone(monkeypatch):
+    def FakeFetch(tickers, period="2y", interval="1d", compact=False):
+        if interval == "1m":
+            days = [MakeMinuteBars("AAPL", f"2024-03-{d} 09:30", 30) for d in range(25, 29)]
+            return pd.concat(days, ignore_index=True)
+
+        dates = pd.bdate_range("2024-02-01", "2024-03-28")
+        close = 100.0 + np.arange(len(dates), dtype=float)
+        return pd.DataFrame(
+            {
+                "ticker": "AAPL",
+                "interval": "1d",
+                "date": dates.strftime("%Y-%m-%d"),
+                "open": close,
+                "high": close + 100.0,
+                "low": close - 50.0,
+                "close": close,
+                "adj_close": close,
+                "volume": 1000,
+            }
+        )
+
+    monkeypatch.setattr(pipeline, "FetchOhlcv", FakeFetch)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+        daily = Settings(data_provider="yfinance", db_path=db_path, tickers=["AAPL"])
+
+        def CoarseBars():
+            conn = Connect(db_path)
+            try:
+                return FetchPrices(conn, "AAPL", "1wk") + FetchPrices(conn, "AAPL", "1mo")
+            finally:
+                conn.close()
+
+        pipeline.RunPipeline(daily)
+        before = CoarseBars()
+
+        # Default RESAMPLE_INTERVALS, but only a few days of minute history
+        pipeline.RunPipeline(Settings(data_provider="yfinance", db_path=db_path, tickers=["AAPL"], interval="1m"))
+
+        assert {r["date"] for r in before} >= {"2024-03-01", "2024-03-25"}
+        assert CoarseBars() == before
+
+
+def TestResolvePeriodFollowsInterval():
+    assert ResolvePeriod("", "1m") == "7d"
+    assert ResolvePeriod("", "5m") == "60d"
+    assert ResolvePeriod("", "1h") == "730d"
+    assert ResolvePeriod("", "1d") == "2y"
+    assert ResolvePeriod("30d", "5m") == "30d"
+    assert ResolvePeriod("max", "1d") == "max"
+
+    with pytest.raises(ValueError):
+        ResolvePeriod("1y", "5m")
+    with pytest.raises(ValueError):
+        ResolvePeriod("lots", "1d")
+
+
+def TestIntradayRunKeepsStoredDailyAnalytics(monkeypatch):
+    calls = []
+
+    def FakeFetch(tickers, period="2y", interval="1d", compact=False):
+        calls.append((period, interval))
+        days = [MakeMinuteBars("AAPL", f"2024-01-0{d} 09:30", 30) for d in range(2, 6)]
+        return pd.concat(days, ignore_index=True).assign(interval=interval)
+
+    monkeypatch.setattr(pipeline, "FetchOhlcv", FakeFetch)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+
+        # What an earlier daily run stored for one of the same days
+        conn = Connect(db_path)
+        InitDb(conn)
+        UpsertAnalytics(
+            conn,
+            [{"ticker": "AAPL", "date": "2024-01-03", "daily_return": 0.01, "ma20": 1.0, "ma50": 2.0, "vol20": 0.1}],
+        )
+        conn.close()
+
+        settings = Settings(
+            data_provider="yfinance",
+            db_path=db_path,
+            tickers=["AAPL"],
+            interval="1m",
+            resample_intervals=["5m", "1d"],
+        )
+        summary = pipeline.RunPipeline(settings)
+
+        conn = Connect(db_path)
+        try:
+            stored = conn.execute(
+                "SELECT ma50 FROM analytics WHERE ticker = 'AAPL' AND date = '2024-01-03'"
+            ).fetchone()
+            assert stored["ma50"] == 2.0
+            assert len(FetchPrices(conn, "AAPL", "1d")) == 4
+        finally:
+            conn.close()
+
+        assert calls == [("7d", "1m")]
+        assert summary["prices_rows_upserted"] == 120
+        assert summary["resampled_rows_upserted"] == 6 * 4 + 4
+        assert summary["analytics_rows_upserted"] == 0
+        assert summary["risk_rows_upserted"] == 0
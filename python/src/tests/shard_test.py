@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+import pytest
+
+import finpulse_py.pipeline as pipeline
+from finpulse_py.config import Settings
+from finpulse_py.db import Connect, UpsertPrices, WriteStats
+from finpulse_py.shard import (
+    AttachShards,
+    FanOutQuery,
+    OpenShards,
+    Reshard,
+    ShardIndex,
+    ShardPaths,
+    UpsertSharded,
+)
+
+
+def MakeRows(tickers, n_days):
+    return [
+        {"ticker": t, "date": f"2024-01-{d + 1:02d}", "close": 100.0 + d, "volume": 10}
+        for t in tickers
+        for d in range(n_days)
+    ]
+
+
+TICKERS = ["AAPL", "MSFT", "GOOGL", "JPM", "GS", "AMZN", "META", "NVDA"]
+
+
+def TestShardPathsKeepsSingleFileLayout():
+    assert ShardPaths("./data/market.db", 1) == ["./data/market.db"]
+    assert ShardPaths("./data/market.db", 3) == [
+        "./data/market.shard0.db",
+        "./data/market.shard1.db",
+        "./data/market.shard2.db",
+    ]
+
+
+def TestShardIndexIsStableAndInRange():
+    for t in TICKERS:
+        assert 0 <= ShardIndex(t, 4) < 4
+        assert ShardIndex(t, 4) == ShardIndex(t, 4)
+
+    # Known value: crc32 must not change between runs/processes, and the
+    # Java API routes reads with the same hash
+    assert ShardIndex("MSFT", 3) == 1
+    assert ShardIndex("AAPL", 4) == 0
+
+
+def TestUpsertShardedRoutesEveryTickerToOneShard():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shards = OpenShards(os.path.join(tmpdir, "market.db"), 4)
+        stats = WriteStats()
+
+        written = UpsertSharded(shards, UpsertPrices, MakeRows(TICKERS, 5), batch_size=3, stats=stats)
+
+        assert written == len(TICKERS) * 5
+        assert stats.rows == len(TICKERS) * 5
+
+        for i, path in enumerate(shards.paths):
+            conn = sqlite3.connect(path)
+            try:
+                stored = {r[0] for r in conn.execute("SELECT DISTINCT ticker FROM prices")}
+            finally:
+                conn.close()
+            assert stored == {t for t in TICKERS if ShardIndex(t, 4) == i}
+
+
+def TestProcessWorkersWriteTheSameRows():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shards = OpenShards(os.path.join(tmpdir, "market.db"), 4)
+        stats = WriteStats()
+
+        written = UpsertSharded(
+            shards, UpsertPrices, MakeRows(TICKERS, 5), batch_size=3, stats=stats, workers="process"
+        )
+
+        rows = FanOutQuery(shards, "SELECT ticker, COUNT(1) AS n FROM prices GROUP BY ticker")
+        assert written == len(TICKERS) * 5
+        assert stats.rows == len(TICKERS) * 5
+        assert {r["ticker"]: r["n"] for r in rows} == {t: 5 for t in TICKERS}
+
+
+def TestPipelineRunsOneProcessPerShard(monkeypatch):
+    def FakeFetch(tickers, period="2y", interval="1d", compact=False):
+        dates = pd.bdate_range("2024-01-01", periods=60).strftime("%Y-%m-%d")
+        return pd.DataFrame(
+            [
+                {"ticker": t, "interval": interval, "date": d, "close": 100.0 + i, "adj_close": 100.0 + i}
+                for t in tickers
+                for i, d in enumerate(dates)
+            ]
+        )
+
+    monkeypatch.setattr(pipeline, "FetchOhlcv", FakeFetch)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        settings = Settings(
+            data_provider="yfinance",
+            db_path=os.path.join(tmpdir, "market.db"),
+            tickers=TICKERS,
+            db_shards=4,
+            shard_workers="process",
+        )
+        summary = pipeline.RunPipeline(settings)
+
+        assert summary["prices_rows_upserted"] == len(TICKERS) * 60
+        assert summary["risk_rows_upserted"] == len(TICKERS)
+        assert summary["write_batches"] > 0
+
+
+def TestCrossShardReads():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        shards = OpenShards(os.path.join(tmpdir, "market.db"), 3)
+        UpsertSharded(shards, UpsertPrices, MakeRows(TICKERS, 4))
+
+        rows = FanOutQuery(shards, "SELECT ticker, COUNT(1) AS n FROM prices GROUP BY ticker")
+        assert {r["ticker"]: r["n"] for r in rows} == {t: 4 for t in TICKERS}
+
+        conn = Connect(os.path.join(tmpdir, "reader.db"))
+        try:
+            AttachShards(conn, shards)
+            n = conn.execute("SELECT COUNT(1) AS n FROM all_prices").fetchone()["n"]
+            assert n == len(TICKERS) * 4
+        finally:
+            conn.close()
+
+
+def TestChangingShardCountNeedsReshard():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "market.db")
+        UpsertSharded(OpenShards(db_path, 1), UpsertPrices, MakeRows(TICKERS, 4))
+
+        # Unsharded data in DB_PATH must not be left behind silently
+        with pytest.raises(ValueError, match="reshard"):
+            OpenShards(db_path, 2)
+
+        result = Reshard(db_path, 2)
+        assert result["rows_copied"] == len(TICKERS) * 4
+        assert not os.path.exists(db_path)
+
+        # Growing the shard count re-routes tickers too
+        with pytest.raises(ValueError, match="reshard"):
+            OpenShards(db_path, 4)
+
+        Reshard(db_path, 4)
+        shards = OpenShards(db_path, 4)
+        for i, path in enumerate(shards.paths):
+            conn = sqlite3.connect(path)
+            try:
+                stored = {r[0] for r in conn.execute("SELECT DISTINCT ticker FROM prices")}
+            finally:
+                conn.close()
+            assert stored == {t for t in TICKERS if ShardIndex(t, 4) == i}
+
+        # And back to the single file the Java API reads
+        Reshard(db_path, 1)
+        assert not any(os.path.exists(p) for p in ShardPaths(db_path, 4))
+
+        shards = OpenShards(db_path, 1)
+        rows = FanOutQuery(shards, "SELECT COUNT(1) AS n FROM prices")
+        assert rows[0]["n"] == len(TICKERS) * 4
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+import finpulse_py.pipeline as pipeline
+from finpulse_py.config import Settings
+from finpulse_py.db import (
+    Connect,
+    InitDb,
+    UpsertPrices,
+    Checkpoint,
+    WalSizeBytes,
+    WriteStats,
+)
+
+
+def MakeRows(n_tickers, n_days):
+    dates = pd.bdate_range("2020-01-01", periods=n_days).strftime("%Y-%m-%d")
+    rows = []
+    for t in range(n_tickers):
+        for d, date in enumerate(dates):
+            rows.append(
+                {
+                    "ticker": f"T{t:03d}",
+                    "date": date,
+                    "open": 100.0 + d,
+                    "high": 101.0 + d,
+                    "low": 99.0 + d,
+                    "close": 100.5 + d,
+                    "adj_close": 100.5 + d,
+                    "volume": 1000 + d,
+                }
+            )
+    return rows
+
+
+def StartReaders(db_path, n_readers, done, latencies):
+    """
+    Reader load generator: runs the same query the Java PriceRepository runs
+    in a tight loop until done is set, recording each query's latency.
+    """
+    def Reader():
+        reader = sqlite3.connect(db_path)
+        try:
+            while not done.is_set():
+                started = time.perf_counter()
+                reader.execute(
+                    "SELECT ticker, date, open, high, low, close, adj_close, volume "
+                    "FROM prices WHERE ticker = ? AND interval = ? "
+                    "ORDER BY date ASC LIMIT ? OFFSET ?",
+                    ("T001", "1d", 100, 0),
+                ).fetchall()
+                latencies.append(time.perf_counter() - started)
+        finally:
+            reader.close()
+
+    readers = [threading.Thread(target=Reader) for _ in range(n_readers)]
+    for r in readers:
+        r.start()
+    return readers
+
+
+def P99(latencies):
+    ordered = sorted(latencies)
+    return ordered[max(int(len(ordered) * 0.99) - 1, 0)]
+
+
+def TestReadersStayFastDuringBatchedWrites():
+    # Readers hammer the DB while a writer pushes a large upload in bounded transactions
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+
+        conn = Connect(db_path)
+        InitDb(conn)
+        UpsertPrices(conn, MakeRows(5, 50))
+
+        done = threading.Event()
+        latencies = []
+        readers = StartReaders(db_path, 4, done, latencies)
+
+        stats = WriteStats()
+        try:
+            UpsertPrices(conn, MakeRows(200, 300), batch_size=2000, stats=stats)
+        finally:
+            done.set()
+            for r in readers:
+                r.join()
+            conn.close()
+
+        assert stats.batches == 30
+        assert stats.rows == 60000
+        assert len(latencies) > 0
+        assert P99(latencies) < 0.25
+
+
+def TestReadersStayFastDuringPipelineRun(monkeypatch):
+    # Same reader load, but against a whole RunPipeline (prices, resampled
+    # bars, analytics, risk and the final WAL checkpoint) with a fake fetcher
+    dates = pd.bdate_range("2020-01-01", periods=300).strftime("%Y-%m-%d")
+
+    def FakeFetch(tickers, period="2y", interval="1d", compact=False):
+        frames = []
+        for i, t in enumerate(tickers):
+            close = [100.0 + i + d * 0.1 for d in range(len(dates))]
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "ticker": t,
+                        "interval": interval,
+                        "date": dates,
+                        "open": close,
+                        "high": close,
+                        "low": close,
+                        "close": close,
+                        "adj_close": close,
+                        "volume": 1000,
+                    }
+                )
+            )
+        return pd.concat(frames, ignore_index=True)
+
+    monkeypatch.setattr(pipeline, "FetchOhlcv", FakeFetch)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+
+        # Seed a table for the readers to query before the pipeline starts
+        conn = Connect(db_path)
+        InitDb(conn)
+        UpsertPrices(conn, MakeRows(5, 50))
+        conn.close()
+
+        settings = Settings(
+            data_provider="yfinance",
+            db_path=db_path,
+            tickers=[f"T{t:03d}" for t in range(100)],
+            write_batch_size=2000,
+        )
+
+        done = threading.Event()
+        latencies = []
+        readers = StartReaders(db_path, 4, done, latencies)
+
+        try:
+            summary = pipeline.RunPipeline(settings)
+        finally:
+            done.set()
+            for r in readers:
+                r.join()
+
+        assert summary["prices_rows_upserted"] == 100 * 300
+        assert summary["analytics_rows_upserted"] == 100 * 300
+        assert summary["risk_rows_upserted"] == 100
+        assert summary["write_batches"] > 10
+        assert summary["wal_bytes_before_checkpoint"] > 0
+        assert summary["wal_bytes_after_checkpoint"] == 0
+
+        assert len(latencies) > 0
+        assert P99(latencies) < 0.25
+
+
+def TestWriterRetriesWhileAnotherWriterHoldsTheLock():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+
+        conn = Connect(db_path, busy_timeout_ms=50)
+        InitDb(conn)
+
+        # A second connection grabs the write lock and releases it a bit later
+        blocker = sqlite3.connect(db_path, check_same_thread=False)
+        blocker.execute("BEGIN IMMEDIATE;")
+        releaser = threading.Timer(0.2, blocker.commit)
+        releaser.start()
+
+        stats = WriteStats()
+        try:
+            UpsertPrices(conn, MakeRows(1, 10), batch_size=5, stats=stats)
+        finally:
+            releaser.join()
+            blocker.close()
+
+        count = conn.execute("SELECT COUNT(1) AS n FROM prices").fetchone()["n"]
+        conn.close()
+
+        assert count == 10
+        assert stats.retries >= 1
+        assert stats.lock_wait_seconds > 0
+
+
+def TestTruncateCheckpointEmptiesWal():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+
+        conn = Connect(db_path)
+        try:
+            InitDb(conn)
+            UpsertPrices(conn, MakeRows(3, 100), batch_size=50)
+
+            assert WalSizeBytes(db_path) > 0
+
+            busy, _, _ = Checkpoint(conn, "TRUNCATE")
+            assert busy == 0
+            assert WalSizeBytes(db_path) == 0
+        finally:
+            conn.close()